@@ -0,0 +1,129 @@
+import base64
+import time
+from typing import List, Optional
+
+import cv2
+import numpy as np
+
+from benchmarks.synthetic import SyntheticRenderer
+
+
+class FakeElement:
+    def __init__(self, driver: "FakeSlotsDriver", locator: str):
+        self._driver = driver
+        self._locator = locator
+
+    def click(self):
+        self._driver.click(self._locator)
+
+
+class _FakeSwitchTo:
+    def frame(self, frame):
+        pass
+
+
+class FakeSlotsDriver:
+    # Serves the subset of the selenium driver used by the live processor, the
+    # spin controller and the screenshot frame sources
+    SPIN_BUTTON = "//button[@id='actions-spin']"
+
+    def __init__(
+        self,
+        renderer: SyntheticRenderer,
+        spin_duration: float = 0.5,
+        capture_delay: float = 0.02,
+        fail_after_spins: Optional[int] = None,
+    ):
+        self._renderer = renderer
+        self._spin_duration = spin_duration
+        self._capture_delay = capture_delay
+        self._fail_after_spins = fail_after_spins
+        self._stops_at = 0.0
+        self._still_screen: Optional[np.ndarray] = None
+        self.switch_to = _FakeSwitchTo()
+        self.spins_symbols: List[np.ndarray] = [renderer.random_symbols()]
+        self.closed = False
+        self.killed = False
+
+    def kill(self):
+        # Every later call fails, as with a crashed browser
+        self.killed = True
+
+    def _check_alive(self):
+        if self.killed:
+            raise RuntimeError("Fake session is killed")
+
+    def is_spinning(self) -> bool:
+        return time.monotonic() < self._stops_at
+
+    def click(self, locator: str):
+        self._check_alive()
+        if locator != self.SPIN_BUTTON:
+            return
+        if (
+            self._fail_after_spins is not None
+            and len(self.spins_symbols) > self._fail_after_spins
+        ):
+            raise RuntimeError("Fake session crashed")
+        self.spins_symbols.append(self._renderer.random_symbols())
+        self._still_screen = None
+        self._stops_at = time.monotonic() + self._spin_duration
+
+    def get(self, url: str):
+        pass
+
+    def find_element(self, by: str, value: str) -> FakeElement:
+        return FakeElement(self, value)
+
+    def find_elements(self, by: str, value: str) -> List[FakeElement]:
+        self._check_alive()
+        return [FakeElement(self, value)] if self.is_spinning() else []
+
+    def set_script_timeout(self, timeout: float):
+        pass
+
+    def execute_async_script(self, script: str, class_name: str, timeout_ms: int):
+        self._check_alive()
+        remaining = self._stops_at - time.monotonic()
+        if remaining > timeout_ms / 1000:
+            time.sleep(timeout_ms / 1000)
+            return False
+        time.sleep(max(remaining, 0))
+        return True
+
+    def execute_script(self, script: str):
+        # Only window.devicePixelRatio is requested
+        return 1
+
+    def _screen(self) -> np.ndarray:
+        if self.is_spinning():
+            return self._renderer.render_screen(self._renderer.render_transition())
+        if self._still_screen is None:
+            self._still_screen = self._renderer.render_screen(
+                self._renderer.render_roi(self.spins_symbols[-1])
+            )
+        return self._still_screen
+
+    def _encode_png(self, image: np.ndarray) -> bytes:
+        image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
+        _, png = cv2.imencode(".png", image, [cv2.IMWRITE_PNG_COMPRESSION, 1])
+        return png.tobytes()
+
+    def get_screenshot_as_png(self) -> bytes:
+        self._check_alive()
+        time.sleep(self._capture_delay)
+        return self._encode_png(self._screen())
+
+    def execute_cdp_cmd(self, cmd: str, params: dict) -> dict:
+        # Only Page.captureScreenshot with a clip is requested
+        self._check_alive()
+        time.sleep(self._capture_delay)
+        clip = params["clip"]
+        image = self._screen()[
+            int(clip["y"]) : int(clip["y"] + clip["height"]),
+            int(clip["x"]) : int(clip["x"] + clip["width"]),
+        ]
+        return dict(data=base64.b64encode(self._encode_png(image)).decode())
+
+    def quit(self):
+        self.closed = True
@@ -0,0 +1,329 @@
+import argparse
+import json
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Iterable, List, Optional
+
+import numpy as np
+
+from benchmarks.synthetic import SyntheticRenderer
+from frame_processing.frames_extraction.frame_cache import FrameCache
+from frame_processing.frames_extraction.frame_extractor import FramesExtractor
+from frame_processing.symbols_aggregator.symbols_aggregator import SymbolsAggregator
+from frame_processing.symbols_identification.symbols_identifier import (
+    CorrSymbolIdentifier,
+    SymbolsProcessor,
+)
+from frame_processing.symbols_images_extraction.symbols_images_extractor import (
+    SymbolsImagesExtractor,
+)
+from games.slots_fortune.processing.config import SYMBOLS_DIR, GRID, SCREEN_ROI
+from utils.custom_metrics import window_correlation
+from utils.data_models import ExpectedSymbol, CroppedSymbol
+from utils.io import read_expected_symbols
+from utils.logger import logger
+
+DEFAULT_BASELINE = Path(__file__).parent / "baseline.json"
+
+
+class StageResult:
+    def __init__(self, name: str, latencies: List[float], peak_memory: int):
+        self.name = name
+        self.latencies = latencies
+        self.peak_memory = peak_memory
+
+    def to_dict(self) -> dict:
+        total_time = sum(self.latencies)
+        return dict(
+            items=len(self.latencies),
+            total_time=total_time,
+            items_per_second=len(self.latencies) / total_time if total_time else 0.0,
+            p50_latency=float(np.percentile(self.latencies, 50)),
+            p99_latency=float(np.percentile(self.latencies, 99)),
+            peak_memory_mb=self.peak_memory / 2**20,
+        )
+
+
+def _timed(items: Iterable) -> List[float]:
+    latencies = []
+    iterator = iter(items)
+    while True:
+        s = time.perf_counter()
+        try:
+            next(iterator)
+        except StopIteration:
+            return latencies
+        latencies.append(time.perf_counter() - s)
+
+
+def measure(name: str, run: Callable[[], Iterable]) -> StageResult:
+    latencies = _timed(run())
+    # Memory is traced in a separate pass, tracing slows allocations down
+    tracemalloc.start()
+    try:
+        for _ in run():
+            pass
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    result = StageResult(name, latencies, peak_memory)
+    logger.info(f"{name}: {json.dumps(result.to_dict())}")
+    return result
+
+
+def compare_search_modes(
+    expected_symbols: List[ExpectedSymbol], cells: List[List[CroppedSymbol]]
+) -> dict:
+    # Pyramid search against exhaustive stride 1 search
+    exhaustive = CorrSymbolIdentifier(
+        expected_symbols, windows_step=1, search_mode="exhaustive"
+    )
+    pyramid = CorrSymbolIdentifier(expected_symbols, search_mode="pyramid")
+    times = dict(exhaustive=0.0, pyramid=0.0)
+    agreed = 0
+    score_differences = []
+    for symbols in cells:
+        images = np.stack([symbol.image[:, :, 0] for symbol in symbols])
+        scores = {}
+        for name, identifier in (("exhaustive", exhaustive), ("pyramid", pyramid)):
+            s = time.perf_counter()
+            scores[name] = identifier._scores(images)
+            times[name] += time.perf_counter() - s
+        passed = {
+            name: value > CorrSymbolIdentifier.METRIC_THRESHOLD
+            for name, value in scores.items()
+        }
+        agreed += int(
+            (
+                (passed["exhaustive"].any(axis=1) == passed["pyramid"].any(axis=1))
+                & (
+                    passed["exhaustive"].argmax(axis=1)
+                    == passed["pyramid"].argmax(axis=1)
+                )
+            ).sum()
+        )
+        score_differences.append(
+            scores["pyramid"].max(axis=1) - scores["exhaustive"].max(axis=1)
+        )
+    score_differences = np.concatenate(score_differences)
+    result = dict(
+        exhaustive_time=times["exhaustive"],
+        pyramid_time=times["pyramid"],
+        speedup=times["exhaustive"] / times["pyramid"] if times["pyramid"] else 0.0,
+        identification_agreement=agreed / len(score_differences),
+        max_best_score_difference=float(np.abs(score_differences).max()),
+    )
+    logger.info(f"pyramid_search: {json.dumps(result)}")
+    return result
+
+
+def compare_threshold_search(
+    expected_symbols: List[ExpectedSymbol], cells: List[List[CroppedSymbol]]
+) -> dict:
+    exhaustive = CorrSymbolIdentifier(expected_symbols, search_mode="exhaustive")
+    threshold = CorrSymbolIdentifier(expected_symbols, search_mode="threshold")
+    times = dict(exhaustive=0.0, threshold=0.0)
+    agreed = 0
+    for symbols in cells:
+        identified = {}
+        for name, identifier in (("exhaustive", exhaustive), ("threshold", threshold)):
+            s = time.perf_counter()
+            identified[name] = identifier.identify_symbols(symbols)
+            times[name] += time.perf_counter() - s
+        agreed += sum(
+            a is b for a, b in zip(identified["exhaustive"], identified["threshold"])
+        )
+    cells_count = sum(len(symbols) for symbols in cells)
+    exhaustive_windows = sum(
+        len(group.indices)
+        * len(range(0, symbols[0].image.shape[0] - group.centered.shape[1] + 1, 3))
+        * len(range(0, symbols[0].image.shape[1] - group.centered.shape[2] + 1, 3))
+        for group in exhaustive._templates_groups
+        for symbols in cells[:1]
+    )
+    result = dict(
+        exhaustive_time=times["exhaustive"],
+        threshold_time=times["threshold"],
+        speedup=times["exhaustive"] / times["threshold"] if times["threshold"] else 0.0,
+        identification_agreement=agreed / cells_count,
+        windows_per_cell=threshold.windows_evaluated / cells_count,
+        exhaustive_windows_per_cell=exhaustive_windows,
+    )
+    logger.info(f"threshold_search: {json.dumps(result)}")
+    return result
+
+
+def run_benchmarks(
+    spins: int = 10,
+    still_frames: int = 30,
+    transition_frames: int = 20,
+    repeats: int = 50,
+    aggregated_symbols: int = 2000,
+    noise: float = 5.0,
+    blur: int = 0,
+    seed: int = 0,
+) -> dict:
+    expected_symbols = read_expected_symbols(SYMBOLS_DIR)
+    renderer = SyntheticRenderer(
+        expected_symbols, GRID, SCREEN_ROI, noise=noise, blur=blur, seed=seed
+    )
+    frames = [renderer.render_roi(renderer.random_symbols()) for _ in range(repeats)]
+    extractor = SymbolsImagesExtractor()
+    processor = SymbolsProcessor(CorrSymbolIdentifier(expected_symbols))
+    cells = [
+        extractor.extract_symbols(frame=f"frame_{i}", frame_image=frame, grid=GRID)
+        for i, frame in enumerate(frames)
+    ]
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        video_path = Path(tmp_dir) / "synthetic.avi"
+        renderer.render_video(
+            video_path,
+            spins=spins,
+            still_frames=still_frames,
+            transition_frames=transition_frames,
+        )
+        results.append(
+            measure(
+                "extract_frames",
+                lambda: FramesExtractor().extract_frames(video_path, SCREEN_ROI),
+            )
+        )
+        # First pass fills the cache, measured passes read the mapped frames
+        frame_cache = FrameCache(Path(tmp_dir) / "frame_cache")
+        for _ in FramesExtractor(frame_cache=frame_cache).extract_frames(
+            video_path, SCREEN_ROI
+        ):
+            pass
+        results.append(
+            measure(
+                "extract_frames_cached",
+                lambda: FramesExtractor(frame_cache=frame_cache).extract_frames(
+                    video_path, SCREEN_ROI
+                ),
+            )
+        )
+
+    results.append(
+        measure(
+            "extract_symbols",
+            lambda: (
+                extractor.extract_symbols(
+                    frame=f"frame_{i}", frame_image=frame, grid=GRID
+                )
+                for i, frame in enumerate(frames)
+            ),
+        )
+    )
+    results.append(
+        measure(
+            "window_correlation",
+            lambda: (
+                window_correlation(
+                    symbols[i % len(symbols)].image,
+                    expected_symbols[i % len(expected_symbols)].image,
+                )
+                for i, symbols in enumerate(cells)
+            ),
+        )
+    )
+    results.append(
+        measure(
+            "process_frames_symbols",
+            lambda: (processor.process_frames_symbols(symbols) for symbols in cells),
+        )
+    )
+
+    symbol_images = [
+        symbol.image
+        for symbols in cells
+        for symbol in symbols
+        for _ in range(max(1, aggregated_symbols // (len(cells) * len(symbols))))
+    ][:aggregated_symbols]
+    results.append(
+        measure(
+            "collect_symbols",
+            lambda: (SymbolsAggregator.collect_symbols(symbol_images) for _ in [0]),
+        )
+    )
+    report = {result.name: result.to_dict() for result in results}
+    report["pyramid_search"] = compare_search_modes(expected_symbols, cells)
+    report["threshold_search"] = compare_threshold_search(expected_symbols, cells)
+    return report
+
+
+def compare_with_baseline(
+    results: dict, baseline: dict, tolerance: float = 0.2
+) -> List[str]:
+    regressions = []
+    for stage, stage_result in results.items():
+        if stage not in baseline:
+            continue
+        for metric in ("p50_latency", "p99_latency", "peak_memory_mb"):
+            if metric not in stage_result or metric not in baseline[stage]:
+                continue
+            current, expected = stage_result[metric], baseline[stage][metric]
+            if expected and current > expected * (1 + tolerance):
+                regressions.append(
+                    f"{stage} {metric}: {current:.6g} vs baseline {expected:.6g}"
+                )
+    return regressions
+
+
+def _parse_args(args: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Run synthetic benchmarks")
+    parser.add_argument("--output", type=Path, default=Path("benchmark_results.json"))
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--spins", type=int, default=10)
+    parser.add_argument(
+        "--still-frames",
+        type=int,
+        default=30,
+        help="Frames of still reels after every spin of the synthetic video",
+    )
+    parser.add_argument(
+        "--transition-frames",
+        type=int,
+        default=20,
+        help="Frames of spinning reels after every still of the synthetic video",
+    )
+    parser.add_argument("--repeats", type=int, default=50)
+    parser.add_argument("--aggregated-symbols", type=int, default=2000)
+    parser.add_argument("--noise", type=float, default=5.0)
+    parser.add_argument("--blur", type=int, default=0)
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args(args)
+
+
+if __name__ == "__main__":
+    arguments = _parse_args()
+    benchmark_results = run_benchmarks(
+        spins=arguments.spins,
+        still_frames=arguments.still_frames,
+        transition_frames=arguments.transition_frames,
+        repeats=arguments.repeats,
+        aggregated_symbols=arguments.aggregated_symbols,
+        noise=arguments.noise,
+        blur=arguments.blur,
+        seed=arguments.seed,
+    )
+    with open(arguments.output, "w") as f:
+        json.dump(benchmark_results, f, indent=2)
+
+    if arguments.save_baseline:
+        with open(arguments.baseline, "w") as f:
+            json.dump(benchmark_results, f, indent=2)
+    elif arguments.baseline.exists():
+        with open(arguments.baseline) as f:
+            found_regressions = compare_with_baseline(
+                benchmark_results, json.load(f), arguments.tolerance
+            )
+        for regression in found_regressions:
+            logger.warning(f"Regression: {regression}")
+        if found_regressions:
+            raise SystemExit(1)
@@ -0,0 +1,102 @@
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from utils.data_models import ExpectedSymbol, SymbolsGrid, ROI
+
+
+class SyntheticRenderer:
+    BACKGROUND = 30
+
+    def __init__(
+        self,
+        expected_symbols: List[ExpectedSymbol],
+        grid: SymbolsGrid,
+        roi: ROI,
+        screen_size: Tuple[int, int] = (1920, 1080),
+        noise: float = 0.0,
+        blur: int = 0,
+        seed: int = 0,
+    ):
+        self._expected_symbols = expected_symbols
+        self._grid = grid
+        self._roi = roi
+        self._screen_size = screen_size
+        self._noise = noise
+        self._blur = blur
+        self._rng = np.random.default_rng(seed)
+
+    def random_symbols(self) -> np.ndarray:
+        return self._rng.integers(
+            0,
+            len(self._expected_symbols),
+            (self._grid.number_of_elements.y, self._grid.number_of_elements.x),
+        )
+
+    def render_roi(
+        self, symbol_ids: np.ndarray, reel_shifts: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        height = self._roi.y_bottom - self._roi.y_top
+        width = self._roi.x_right - self._roi.x_left
+        image = np.full((height, width, 3), self.BACKGROUND, np.uint8)
+        for cell in self._grid.cells:
+            symbol = self._expected_symbols[symbol_ids[cell.index.y, cell.index.x]]
+            symbol_image = symbol.image[:, :, :3]
+            if reel_shifts is not None and reel_shifts[cell.index.x]:
+                symbol_image = np.roll(symbol_image, reel_shifts[cell.index.x], axis=0)
+            image[
+                cell.roi.y_top : cell.roi.y_bottom, cell.roi.x_left : cell.roi.x_right
+            ] = symbol_image[
+                : cell.roi.y_bottom - cell.roi.y_top,
+                : cell.roi.x_right - cell.roi.x_left,
+            ]
+        if self._blur:
+            image = cv2.GaussianBlur(image, (0, 0), self._blur)
+        if self._noise:
+            image = np.clip(
+                image + self._rng.normal(0, self._noise, image.shape), 0, 255
+            ).astype(np.uint8)
+        return image
+
+    def render_screen(self, roi_image: np.ndarray) -> np.ndarray:
+        width, height = self._screen_size
+        screen = np.full((height, width, 3), self.BACKGROUND, np.uint8)
+        screen[
+            self._roi.y_top : self._roi.y_bottom, self._roi.x_left : self._roi.x_right
+        ] = roi_image
+        return screen
+
+    def render_transition(self) -> np.ndarray:
+        reel_shifts = self._rng.integers(
+            1, self._grid.symbol_size.y, self._grid.number_of_elements.x
+        )
+        return self.render_roi(self.random_symbols(), reel_shifts)
+
+    def render_video(
+        self,
+        video_path: Path,
+        spins: int = 10,
+        still_frames: int = 30,
+        transition_frames: int = 20,
+        fps: int = 30,
+    ) -> List[np.ndarray]:
+        writer = cv2.VideoWriter(
+            str(video_path), cv2.VideoWriter_fourcc(*"MJPG"), fps, self._screen_size
+        )
+        spins_symbols = []
+        try:
+            for _ in range(spins):
+                symbol_ids = self.random_symbols()
+                spins_symbols.append(symbol_ids)
+                still = self.render_screen(self.render_roi(symbol_ids))
+                for _ in range(still_frames):
+                    if self._noise:
+                        still = self.render_screen(self.render_roi(symbol_ids))
+                    writer.write(still)
+                for _ in range(transition_frames):
+                    writer.write(self.render_screen(self.render_transition()))
+        finally:
+            writer.release()
+        return spins_symbols
@@ -1,9 +1,11 @@
+from collections import deque
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Iterator, Tuple
 
 import numpy as np
 
 from frame_processing.frames_extraction.frame_extractor import FramesExtractor
+from frame_processing.result_sinks import BaseResultSink, write_results
 from frame_processing.symbols_identification.symbols_identifier import (
     SymbolsProcessor,
     CorrSymbolIdentifier,
@@ -11,29 +13,70 @@ from frame_processing.symbols_identification.symbols_identifier import (
 from frame_processing.symbols_images_extraction.symbols_images_extractor import (
     SymbolsImagesExtractor,
 )
-from utils.data_models import ROI, SymbolsGrid, Reel
+from frame_processing.worker_pool import create_process_pool, submit, worker_state
+from utils import metrics
+from utils.data_models import ROI, SymbolsGrid
+from utils.debug_sink import get_debug_sink
 
 
-def process_video(
+def iterate_video(
     video_path: Path,
     frame_extractor: FramesExtractor,
     roi: ROI,
     grid: SymbolsGrid,
     symbols_extractor: SymbolsImagesExtractor,
     reels_processor: SymbolsProcessor,
-) -> Dict[str, Optional[List[Reel]]]:
-    result = {}
-    for index, frame in enumerate(frame_extractor.extract_frames(video_path, roi)):
-        frame_name = f"frame_{index}"
-        symbols = symbols_extractor.extract_symbols(
-            frame=frame_name, frame_image=frame, grid=grid
+    workers: int = 1,
+    queue_depth: Optional[int] = None,
+) -> Iterator[Tuple[str, Optional[List[dict]]]]:
+    frames = (
+        (f"frame_{index}", frame)
+        for index, frame in enumerate(frame_extractor.extract_frames(video_path, roi))
+    )
+    if workers > 1:
+        yield from _process_frames_in_pool(
+            frames,
+            symbols_extractor=symbols_extractor,
+            reels_processor=reels_processor,
+            grid=grid,
+            workers=workers,
+            queue_depth=queue_depth or 2 * workers,
         )
-        processed = reels_processor.process_frames_symbols(symbols)
-        if processed is not None:
-            result[frame_name] = [reel.to_dict() for reel in processed]
-        else:
-            result[frame_name] = processed
-    return result
+        return
+    for frame_name, frame_image in frames:
+        yield frame_name, process_frame(
+            frame_name=frame_name,
+            frame_image=frame_image,
+            symbols_extractor=symbols_extractor,
+            reels_processor=reels_processor,
+            grid=grid,
+        )
+
+
+def process_video(
+    video_path: Path,
+    frame_extractor: FramesExtractor,
+    roi: ROI,
+    grid: SymbolsGrid,
+    symbols_extractor: SymbolsImagesExtractor,
+    reels_processor: SymbolsProcessor,
+    workers: int = 1,
+    queue_depth: Optional[int] = None,
+    result_sink: Optional[BaseResultSink] = None,
+) -> Optional[Dict[str, Optional[List[dict]]]]:
+    return write_results(
+        iterate_video(
+            video_path=video_path,
+            frame_extractor=frame_extractor,
+            roi=roi,
+            grid=grid,
+            symbols_extractor=symbols_extractor,
+            reels_processor=reels_processor,
+            workers=workers,
+            queue_depth=queue_depth,
+        ),
+        result_sink,
+    )
 
 
 def process_frame(
@@ -42,11 +85,60 @@ def process_frame(
     symbols_extractor: SymbolsImagesExtractor,
     reels_processor: SymbolsProcessor,
     grid: SymbolsGrid,
+    save_frame_image: bool = False,
 ) -> Optional[List[dict]]:
-    symbols = symbols_extractor.extract_symbols(
-        frame=frame_name, frame_image=frame_image, grid=grid
-    )
-    processed = reels_processor.process_frames_symbols(symbols)
+    metrics.increment("frames")
+    with metrics.timer("process_frame"):
+        symbols = symbols_extractor.extract_symbols(
+            frame=frame_name, frame_image=frame_image, grid=grid
+        )
+        processed = reels_processor.process_frames_symbols(symbols)
+
+    debug_sink = get_debug_sink()
+    if debug_sink is not None:
+        debug_sink.save_frame(
+            frame=frame_name,
+            symbols=symbols,
+            identified=processed is not None,
+            frame_image=frame_image if save_frame_image else None,
+        )
     if processed is not None:
         processed = [reel.to_dict() for reel in processed]
     return processed
+
+
+def _process_frame_in_worker(
+    frame_name: str, frame_image: np.ndarray
+) -> Optional[List[dict]]:
+    return process_frame(frame_name=frame_name, frame_image=frame_image, **worker_state)
+
+
+def _process_frames_in_pool(
+    frames: Iterator[Tuple[str, np.ndarray]],
+    symbols_extractor: SymbolsImagesExtractor,
+    reels_processor: SymbolsProcessor,
+    grid: SymbolsGrid,
+    workers: int,
+    queue_depth: int,
+) -> Iterator[Tuple[str, Optional[List[dict]]]]:
+    # Processors with expected symbols are sent once per worker, tasks carry frames only
+    with create_process_pool(
+        workers,
+        symbols_extractor=symbols_extractor,
+        reels_processor=reels_processor,
+        grid=grid,
+    ) as executor:
+        pending = deque()
+        for frame_name, frame_image in frames:
+            pending.append(
+                (
+                    frame_name,
+                    submit(executor, _process_frame_in_worker, frame_name, frame_image),
+                )
+            )
+            if len(pending) >= queue_depth:
+                frame_name, future = pending.popleft()
+                yield frame_name, future.result()
+        while pending:
+            frame_name, future = pending.popleft()
+            yield frame_name, future.result()
@@ -0,0 +1,290 @@
+import argparse
+import hashlib
+import json
+import multiprocessing
+import time
+from concurrent.futures import as_completed
+from pathlib import Path
+from typing import List, Set, Tuple, Optional
+
+from frame_processing import process_video
+from frame_processing.frames_extraction.frame_cache import FrameCache
+from frame_processing.frames_extraction.frame_extractor import FramesExtractor
+from frame_processing.symbols_identification.cached_identifier import (
+    CachedSymbolIdentifier,
+)
+from frame_processing.symbols_identification.symbols_identifier import (
+    SymbolsProcessor,
+    CorrSymbolIdentifier,
+)
+from frame_processing.symbols_images_extraction.symbols_images_extractor import (
+    SymbolsImagesExtractor,
+)
+from frame_processing.worker_pool import create_process_pool, submit, worker_state
+from utils.data_models import ROI, SymbolsGrid, Vector
+from utils.logger import logger
+from utils.spin_results import SpinResults
+
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mkv", ".mov", ".webm")
+CHECKPOINT_FILENAME = "checkpoint.jsonl"
+
+
+def list_videos(source: Path) -> List[Path]:
+    if source.is_dir():
+        return sorted(
+            path.resolve()
+            for path in source.rglob("*")
+            if path.suffix.lower() in VIDEO_EXTENSIONS
+        )
+    with open(source) as f:
+        lines = [line.strip() for line in f]
+    return [
+        (source.parent / line).resolve()
+        for line in lines
+        if line and not line.startswith("#")
+    ]
+
+
+def parse_shard(shard: str) -> Tuple[int, int]:
+    index, count = (int(x) for x in shard.split("/"))
+    if not 0 <= index < count:
+        raise ValueError(f"Shard index should be in [0, {count}), got {index}")
+    return index, count
+
+
+def select_shard(videos: List[Path], shard_index: int, shards_count: int) -> List[Path]:
+    return [video for i, video in enumerate(videos) if i % shards_count == shard_index]
+
+
+def result_path(output_dir: Path, video_path: Path, compact: bool = False) -> Path:
+    path_hash = hashlib.sha1(str(video_path).encode()).hexdigest()[:8]
+    suffix = ".npz" if compact else ".json"
+    return output_dir / f"{video_path.stem}_{path_hash}{suffix}"
+
+
+def read_checkpoint(checkpoint_path: Path) -> Set[str]:
+    if not checkpoint_path.exists():
+        return set()
+    finished = set()
+    with open(checkpoint_path) as f:
+        for line in f:
+            if line.strip():
+                finished.add(json.loads(line)["video"])
+    return finished
+
+
+def _identification_cache(
+    reels_processor: SymbolsProcessor,
+) -> Optional[CachedSymbolIdentifier]:
+    identifier = reels_processor.symbol_identifier
+    return identifier if isinstance(identifier, CachedSymbolIdentifier) else None
+
+
+def _process_video_in_worker(
+    video_path: Path,
+) -> Tuple[dict, float, List[Tuple[str, Optional[str]]]]:
+    s = time.time()
+    cache = _identification_cache(worker_state["reels_processor"])
+    if cache is not None:
+        cache.track_new_entries()
+    result = process_video(video_path=video_path, **worker_state)
+    # Each worker fills its own copy of the cache, new identifications are sent
+    # back to be merged into the cache of this process
+    new_entries = cache.drain_new_entries() if cache is not None else []
+    return result, time.time() - s, new_entries
+
+
+def process_videos(
+    videos: List[Path],
+    output_dir: Path,
+    frame_extractor: FramesExtractor,
+    roi: ROI,
+    grid: SymbolsGrid,
+    symbols_extractor: SymbolsImagesExtractor,
+    reels_processor: SymbolsProcessor,
+    workers: int = 1,
+    compact: bool = False,
+) -> dict:
+    output_dir.mkdir(parents=True, exist_ok=True)
+    checkpoint_path = output_dir / CHECKPOINT_FILENAME
+    finished = read_checkpoint(checkpoint_path)
+    pending = [video for video in videos if str(video) not in finished]
+    logger.info(
+        f"{len(videos) - len(pending)} of {len(videos)} videos are already processed"
+    )
+
+    cache = _identification_cache(reels_processor)
+    s = time.time()
+    processed_videos = 0
+    processed_frames = 0
+    with create_process_pool(
+        workers,
+        frame_extractor=frame_extractor,
+        roi=roi,
+        grid=grid,
+        symbols_extractor=symbols_extractor,
+        reels_processor=reels_processor,
+    ) as executor, open(checkpoint_path, "a") as checkpoint:
+        futures = {
+            submit(executor, _process_video_in_worker, video): video
+            for video in pending
+        }
+        for future in as_completed(futures):
+            video = futures[future]
+            try:
+                result, video_time, new_entries = future.result()
+            except Exception:
+                logger.exception(f"Failed to process video {video}")
+                continue
+            if cache is not None:
+                cache.add_entries(new_entries)
+
+            output_path = result_path(output_dir, video, compact)
+            if compact:
+                SpinResults.from_dict(result).save(output_path)
+            else:
+                with open(output_path, "w") as f:
+                    json.dump(result, f)
+            checkpoint.write(
+                json.dumps(
+                    dict(
+                        video=str(video),
+                        output=str(output_path),
+                        frames=len(result),
+                        time=video_time,
+                    )
+                )
+                + "\n"
+            )
+            checkpoint.flush()
+
+            processed_videos += 1
+            processed_frames += len(result)
+            logger.info(
+                f"Processed video {video}: {len(result)} frames in {video_time:.1f} s"
+            )
+
+    total_time = time.time() - s
+    report = dict(
+        videos=processed_videos,
+        failed=len(pending) - processed_videos,
+        frames=processed_frames,
+        time=total_time,
+        videos_per_hour=processed_videos / total_time * 3600 if total_time else 0.0,
+        frames_per_second=processed_frames / total_time if total_time else 0.0,
+    )
+    logger.info(
+        f"Processed {processed_videos} videos ({report['failed']} failed), "
+        f"{processed_frames} frames in {total_time:.1f} s: "
+        f"{report['videos_per_hour']:.1f} videos/hour, "
+        f"{report['frames_per_second']:.2f} frames/s"
+    )
+    return report
+
+
+def _parse_args(args: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Process a batch of slot videos")
+    parser.add_argument(
+        "source", type=Path, help="Directory with videos or manifest file"
+    )
+    parser.add_argument("--symbols", type=Path, required=True)
+    parser.add_argument("--output", type=Path, required=True)
+    parser.add_argument("--shard", default="0/1", help="Shard i/n, i is 0-based")
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count())
+    parser.add_argument("--skip-frames", type=int, default=5)
+    parser.add_argument(
+        "--compact", action="store_true", help="Save results as compact .npz"
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Re-identify only cells changed since the previous frame",
+    )
+    parser.add_argument(
+        "--similarity-mode",
+        choices=FramesExtractor.SIMILARITY_MODES,
+        default="full",
+        help="Compare frames by full ROI frames or by grayscale thumbnails",
+    )
+    parser.add_argument(
+        "--frame-cache",
+        type=Path,
+        help="Directory to cache decoded ROI frames in for repeated runs",
+    )
+    parser.add_argument(
+        "--frame-cache-size",
+        type=float,
+        default=16.0,
+        help="Size limit of the frame cache in GiB",
+    )
+    parser.add_argument(
+        "--identification-cache",
+        type=Path,
+        help="File to load identifications of symbol images from and save them to",
+    )
+    parser.add_argument(
+        "--identification-cache-size",
+        type=int,
+        default=4096,
+        help="Number of cached identifications",
+    )
+    parser.add_argument(
+        "--roi",
+        type=int,
+        nargs=4,
+        default=(450, 1500, 129, 729),
+        metavar=("X_LEFT", "X_RIGHT", "Y_TOP", "Y_BOTTOM"),
+    )
+    parser.add_argument("--grid-start", type=int, nargs=2, default=(45, 85))
+    parser.add_argument("--grid-symbol-size", type=int, nargs=2, default=(185, 140))
+    parser.add_argument("--grid-offset", type=int, nargs=2, default=(0, 20))
+    parser.add_argument("--grid-size", type=int, nargs=2, default=(5, 3))
+    return parser.parse_args(args)
+
+
+if __name__ == "__main__":
+    from utils.io import read_expected_symbols
+
+    arguments = _parse_args()
+    shard_index, shards_count = parse_shard(arguments.shard)
+    videos = select_shard(list_videos(arguments.source), shard_index, shards_count)
+
+    expected_symbols = read_expected_symbols(arguments.symbols)
+    identifier = CorrSymbolIdentifier(expected_symbols)
+    if arguments.identification_cache is not None:
+        identifier = CachedSymbolIdentifier(
+            identifier,
+            expected_symbols,
+            max_size=arguments.identification_cache_size,
+            cache_path=arguments.identification_cache,
+        )
+
+    process_videos(
+        videos=videos,
+        output_dir=arguments.output,
+        frame_extractor=FramesExtractor(
+            skip_frames=arguments.skip_frames,
+            similarity_mode=arguments.similarity_mode,
+            frame_cache=(
+                FrameCache(
+                    arguments.frame_cache,
+                    max_size=int(arguments.frame_cache_size * 2**30),
+                )
+                if arguments.frame_cache is not None
+                else None
+            ),
+        ),
+        roi=ROI(*arguments.roi),
+        grid=SymbolsGrid(
+            start_point=Vector(*arguments.grid_start),
+            symbol_size=Vector(*arguments.grid_symbol_size),
+            offset=Vector(*arguments.grid_offset),
+            number_of_elements=Vector(*arguments.grid_size),
+        ),
+        symbols_extractor=SymbolsImagesExtractor(),
+        reels_processor=SymbolsProcessor(identifier, incremental=arguments.incremental),
+        workers=arguments.workers,
+        compact=arguments.compact,
+    )
+    if isinstance(identifier, CachedSymbolIdentifier):
+        identifier.save()
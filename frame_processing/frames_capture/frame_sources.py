@@ -0,0 +1,102 @@
+import base64
+import itertools
+import time
+from abc import abstractmethod
+from io import BytesIO
+from typing import Sequence
+
+import numpy as np
+from PIL import Image
+
+from utils.data_models import ROI
+from utils.image_processing import crop_image
+
+
+def decode_png(data: bytes) -> np.ndarray:
+    # Same channel order as np.array(PIL.Image.open(...)), several times faster
+    import cv2
+
+    image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_UNCHANGED)
+    if image.ndim == 3 and image.shape[2] == 4:
+        return cv2.cvtColor(image, cv2.COLOR_BGRA2RGBA)
+    if image.ndim == 3:
+        return cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+    return image
+
+
+class BaseFrameSource:
+    @abstractmethod
+    def get_frame(self) -> np.ndarray:
+        pass
+
+    def close(self):
+        pass
+
+
+class WindowScreenshotFrameSource(BaseFrameSource):
+    def __init__(self, driver, roi: ROI):
+        self._driver = driver
+        self._roi = roi
+
+    def get_frame(self) -> np.ndarray:
+        frame_image = np.array(
+            Image.open(BytesIO(self._driver.get_screenshot_as_png()))
+        )
+        return crop_image(frame_image, self._roi)
+
+
+class ClippedScreenshotFrameSource(BaseFrameSource):
+    def __init__(self, driver, roi: ROI):
+        self._driver = driver
+        self._roi = roi
+        self._device_pixel_ratio = None
+
+    def _clip(self) -> dict:
+        if self._device_pixel_ratio is None:
+            self._device_pixel_ratio = self._driver.execute_script(
+                "return window.devicePixelRatio"
+            )
+        # ROI is given in screenshot pixels, clip is expected in CSS pixels
+        ratio = self._device_pixel_ratio or 1
+        return dict(
+            x=self._roi.x_left / ratio,
+            y=self._roi.y_top / ratio,
+            width=(self._roi.x_right - self._roi.x_left) / ratio,
+            height=(self._roi.y_bottom - self._roi.y_top) / ratio,
+            scale=1,
+        )
+
+    def _capture(self) -> np.ndarray:
+        screenshot = self._driver.execute_cdp_cmd(
+            "Page.captureScreenshot",
+            dict(format="png", clip=self._clip(), captureBeyondViewport=False),
+        )
+        return decode_png(base64.b64decode(screenshot["data"]))
+
+    def get_frame(self) -> np.ndarray:
+        height = self._roi.y_bottom - self._roi.y_top
+        width = self._roi.x_right - self._roi.x_left
+        frame_image = self._capture()
+        if frame_image.shape[0] < height or frame_image.shape[1] < width:
+            # Ratio changes when the window is zoomed or moved to another screen
+            self._device_pixel_ratio = None
+            frame_image = self._capture()
+        if frame_image.shape[0] < height or frame_image.shape[1] < width:
+            raise ValueError(
+                f"Screenshot clip has shape {frame_image.shape[:2]}, "
+                f"expected at least ROI size {(height, width)}"
+            )
+        return frame_image[:height, :width]
+
+
+class FakeFrameSource(BaseFrameSource):
+    def __init__(self, frames: Sequence[np.ndarray], capture_delay: float = 0.0):
+        self._frames = itertools.cycle(frames)
+        self._capture_delay = capture_delay
+        self.captured = 0
+
+    def get_frame(self) -> np.ndarray:
+        if self._capture_delay:
+            time.sleep(self._capture_delay)
+        self.captured += 1
+        return next(self._frames)
@@ -0,0 +1,159 @@
+import hashlib
+import json
+import os
+import time
+import uuid
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from utils import metrics
+from utils.data_models import ROI
+from utils.logger import logger
+
+# Hashing the whole recording would take a noticeable part of decoding it,
+# so only its size and a few chunks are hashed
+_FINGERPRINT_CHUNK = 2**20
+
+
+def video_fingerprint(video_path: Path) -> str:
+    size = video_path.stat().st_size
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(str(size).encode())
+    with open(video_path, "rb") as f:
+        for offset in (0, size // 2, max(size - _FINGERPRINT_CHUNK, 0)):
+            f.seek(offset)
+            digest.update(f.read(_FINGERPRINT_CHUNK))
+    return digest.hexdigest()
+
+
+class FrameCache:
+    DATA_SUFFIX = ".frames"
+    INDEX_SUFFIX = ".json"
+
+    def __init__(self, cache_dir: Path, max_size: int = 16 * 2**30):
+        self._cache_dir = cache_dir
+        self._max_size = max_size
+
+    def key(self, video_path: Path, roi: ROI, skip_frames: int) -> str:
+        return (
+            f"{video_fingerprint(video_path)}_"
+            f"{roi.x_left}_{roi.x_right}_{roi.y_top}_{roi.y_bottom}_{skip_frames}"
+        )
+
+    def _paths(self, key: str) -> Tuple[Path, Path]:
+        return (
+            self._cache_dir / f"{key}{self.DATA_SUFFIX}",
+            self._cache_dir / f"{key}{self.INDEX_SUFFIX}",
+        )
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        data_path, index_path = self._paths(key)
+        try:
+            with open(index_path) as f:
+                entry = json.load(f)
+            frames = np.memmap(
+                data_path, dtype=np.uint8, mode="r", shape=tuple(entry["shape"])
+            )
+            # Modification time of the index is the last use of the entry
+            os.utime(index_path)
+        except (FileNotFoundError, ValueError):
+            metrics.increment("frame_cache.misses")
+            return None
+        metrics.increment("frame_cache.hits")
+        # Plain ndarray view over the mapping is much cheaper to slice than np.memmap
+        return frames.view(np.ndarray)
+
+    def write_through(
+        self, key: str, frames: Iterable[np.ndarray]
+    ) -> Iterator[np.ndarray]:
+        # Frames are passed on as they are read, the entry is stored only when
+        # all of them are read
+        self._cache_dir.mkdir(parents=True, exist_ok=True)
+        data_path, index_path = self._paths(key)
+        tmp_path = data_path.with_name(f"{data_path.name}.{uuid.uuid4().hex}.tmp")
+        shape: Optional[Tuple[int, ...]] = None
+        count = 0
+        caching = True
+        try:
+            with open(tmp_path, "wb") as f:
+                for frame in frames:
+                    if caching:
+                        shape = shape or frame.shape
+                        caching = (
+                            frame.shape == shape
+                            and frame.dtype == np.uint8
+                            and (count + 1) * frame.nbytes <= self._max_size
+                        )
+                        if caching:
+                            f.write(np.ascontiguousarray(frame).data)
+                            count += 1
+                        else:
+                            logger.info(f"Frames of {key} are not cached")
+                    yield frame
+            if caching and count:
+                tmp_path.replace(data_path)
+                self._write_index(index_path, (count, *shape))
+                metrics.increment("frame_cache.stored_videos")
+                self.evict(keep=key)
+        finally:
+            if tmp_path.exists():
+                tmp_path.unlink()
+
+    def _write_index(self, index_path: Path, shape: Tuple[int, ...]):
+        tmp_path = index_path.with_name(f"{index_path.name}.{uuid.uuid4().hex}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(
+                dict(shape=list(shape), size=int(np.prod(shape)), created=time.time()),
+                f,
+            )
+        tmp_path.replace(index_path)
+
+    def entries(self) -> List[dict]:
+        entries = []
+        for index_path in self._cache_dir.glob(f"*{self.INDEX_SUFFIX}"):
+            try:
+                with open(index_path) as f:
+                    entry = json.load(f)
+                entry.update(
+                    key=index_path.name[: -len(self.INDEX_SUFFIX)],
+                    last_used=index_path.stat().st_mtime,
+                )
+            except (FileNotFoundError, ValueError):
+                # Removed or being replaced by another process
+                continue
+            entries.append(entry)
+        return entries
+
+    def size(self) -> int:
+        return sum(entry["size"] for entry in self.entries())
+
+    def remove(self, key: str) -> bool:
+        data_path, index_path = self._paths(key)
+        try:
+            # Index first, so that the entry is not read while its data is removed
+            if index_path.exists():
+                index_path.unlink()
+            if data_path.exists():
+                data_path.unlink()
+        except OSError as e:
+            # Frames mapped by another process can not be removed on Windows
+            logger.warning(f"Failed to remove cached frames {key}: {e}")
+            return False
+        return True
+
+    def evict(self, keep: Optional[str] = None):
+        entries = sorted(self.entries(), key=lambda entry: entry["last_used"])
+        total_size = sum(entry["size"] for entry in entries)
+        for entry in entries:
+            if total_size <= self._max_size:
+                break
+            if entry["key"] != keep and self.remove(entry["key"]):
+                total_size -= entry["size"]
+                metrics.increment("frame_cache.evicted_videos")
+                logger.info(f"Evicted cached frames {entry['key']}")
+
+    def clear(self):
+        for entry in self.entries():
+            self.remove(entry["key"])
@@ -1,49 +1,160 @@
 from pathlib import Path
-from typing import Iterator
-import cv2
+from typing import Iterator, Optional, Tuple
 import numpy as np
 
+from frame_processing.frames_extraction.frame_cache import FrameCache
+from utils import metrics
+from utils.background import iterate_in_background
 from utils.data_models import ROI
 from utils.image_processing import crop_image
 
 
 class FramesExtractor:
     CORR_THRESH = 0.9
+    SIMILARITY_MODES = ("full", "thumbnail")
+    # A seek restarts decoding from the preceding key frame and costs about as
+    # much as decoding 15-20 frames of MJPG or MPEG-4 recordings, so sampled
+    # frames are seeked to only when many frames are skipped
+    SEEK_MIN_SKIP = 30
 
-    def __init__(self, skip_frames: int = 5, similar_frames_needed: int = 3):
+    def __init__(
+        self,
+        skip_frames: int = 5,
+        similar_frames_needed: int = 3,
+        decode_in_background: bool = True,
+        queue_size: int = 8,
+        similarity_mode: str = "full",
+        similarity_threshold: Optional[float] = None,
+        thumbnail_size: Tuple[int, int] = (64, 36),
+        frame_cache: Optional[FrameCache] = None,
+        seek_min_skip: Optional[int] = None,
+    ):
+        if similarity_mode not in self.SIMILARITY_MODES:
+            raise ValueError(
+                f"Unknown similarity mode {similarity_mode}, "
+                f"expected one of {self.SIMILARITY_MODES}"
+            )
         self._skip_frames = skip_frames
         self._similar_frames_needed = similar_frames_needed
+        self._decode_in_background = decode_in_background
+        self._queue_size = queue_size
+        self._similarity_mode = similarity_mode
+        self._similarity_threshold = (
+            self.CORR_THRESH if similarity_threshold is None else similarity_threshold
+        )
+        self._thumbnail_size = thumbnail_size
+        self._frame_cache = frame_cache
+        self._seek_min_skip = (
+            self.SEEK_MIN_SKIP if seek_min_skip is None else seek_min_skip
+        )
 
-    def extract_frames(self, video_path: Path, roi: ROI) -> Iterator[np.ndarray]:
-        frames = []
-        video = cv2.VideoCapture(str(video_path))
+    def _read_sampled_frames(self, video_path: Path, roi: ROI) -> Iterator[np.ndarray]:
+        import cv2
 
-        _, prev_frame = video.read()
-        prev_frame = crop_image(prev_frame, roi)
-        similar_frames = 0
-        counter = 0
+        video = cv2.VideoCapture(str(video_path))
+        try:
+            _, frame = video.read()
+            yield crop_image(frame, roi)
 
-        while True:
-            _, curr_frame = video.read()
-            if curr_frame is None:
-                break
+            if self._skip_frames >= self._seek_min_skip:
+                frames = self._seek_frames(video)
+            else:
+                frames = self._grab_frames(video)
+            for frame in frames:
+                metrics.increment("frames_extraction.sampled_frames")
+                yield crop_image(frame, roi)
+        finally:
+            video.release()
 
-            curr_frame = crop_image(curr_frame, roi)
+    def _grab_frames(self, video) -> Iterator[np.ndarray]:
+        # grab() decodes every frame with the FFmpeg backend, retrieve() only
+        # converts the decoded frame to BGR, so it is skipped for skipped frames
+        counter = 0
+        while video.grab():
             counter += 1
             if counter < self._skip_frames:
                 continue
-            else:
-                counter = 0
+            counter = 0
+
+            with metrics.timer("frames_extraction.decode"):
+                _, frame = video.retrieve()
+            if frame is None:
+                return
+            yield frame
 
-            if not self._is_frames_similar(curr_frame, prev_frame):
+    def _seek_frames(self, video) -> Iterator[np.ndarray]:
+        import cv2
+
+        position = 0
+        while True:
+            position += self._skip_frames
+            with metrics.timer("frames_extraction.decode"):
+                video.set(cv2.CAP_PROP_POS_FRAMES, position)
+                read, frame = video.read()
+            if not read:
+                return
+            yield frame
+
+    def _sampled_frames(self, video_path: Path, roi: ROI) -> Iterator[np.ndarray]:
+        frames = self._read_sampled_frames(video_path, roi)
+        if self._frame_cache is not None:
+            key = self._frame_cache.key(video_path, roi, self._skip_frames)
+            cached = self._frame_cache.get(key)
+            if cached is not None:
+                # Frames are views of the mapped file, nothing is decoded
+                return iter(cached)
+            frames = self._frame_cache.write_through(key, frames)
+        if self._decode_in_background:
+            frames = iterate_in_background(frames, self._queue_size)
+        return frames
+
+    def extract_frames(self, video_path: Path, roi: ROI) -> Iterator[np.ndarray]:
+        frames = self._sampled_frames(video_path, roi)
+
+        prev_frame = next(frames)
+        prev_signature = self._signature(prev_frame)
+        similar_frames = 0
+
+        for curr_frame in frames:
+            with metrics.timer("frames_extraction.similarity"):
+                curr_signature = self._signature(curr_frame)
+                similar = self._is_signatures_similar(curr_signature, prev_signature)
+            if not similar:
                 if similar_frames > self._similar_frames_needed:
+                    metrics.increment("frames_extraction.stable_frames")
                     yield prev_frame
                 similar_frames = 0
             else:
                 similar_frames += 1
             prev_frame = curr_frame
+            prev_signature = curr_signature
 
-    def _is_frames_similar(self, frame_1: np.ndarray, frame_2: np.ndarray) -> bool:
-        return (
-            np.corrcoef(frame_1.flatten(), frame_2.flatten())[0][1] > self.CORR_THRESH
-        )
+    def _signature(self, frame: np.ndarray) -> np.ndarray:
+        # Centered unit vector, so that correlation of two frames is a dot product
+        # of their signatures
+        if self._similarity_mode == "thumbnail":
+            import cv2
+
+            width, height = self._thumbnail_size
+            # Decimate before area interpolation, which is slow on large frames
+            step = max(
+                1, min(frame.shape[0] // (2 * height), frame.shape[1] // (2 * width))
+            )
+            thumbnail = cv2.resize(
+                frame[::step, ::step],
+                self._thumbnail_size,
+                interpolation=cv2.INTER_AREA,
+            )
+            signature = thumbnail.mean(axis=2, dtype=np.float32).ravel()
+        else:
+            signature = frame.astype(np.float64).ravel()
+        signature -= signature.mean()
+        norm = np.linalg.norm(signature)
+        if norm > 0:
+            signature /= norm
+        return signature
+
+    def _is_signatures_similar(
+        self, signature_1: np.ndarray, signature_2: np.ndarray
+    ) -> bool:
+        return np.dot(signature_1, signature_2) > self._similarity_threshold
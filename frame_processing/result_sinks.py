@@ -0,0 +1,90 @@
+import json
+import os
+import time
+from abc import abstractmethod
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+from utils.spin_results import FrameResult
+
+ResultCallback = Callable[[str, FrameResult], None]
+
+
+class BaseResultSink:
+    @abstractmethod
+    def write(self, frame: str, result: FrameResult):
+        pass
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class JsonlResultSink(BaseResultSink):
+    def __init__(self, path: Path, fsync_interval: float = 5.0):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(path, "a")
+        self._fsync_interval = fsync_interval
+        self._synced_at = time.monotonic()
+
+    def write(self, frame: str, result: FrameResult):
+        self._file.write(json.dumps(dict(frame=frame, result=result)) + "\n")
+        # Flushed lines survive a crash of the process, fsync also a crash of the OS
+        self._file.flush()
+        if time.monotonic() - self._synced_at >= self._fsync_interval:
+            self.sync()
+
+    def sync(self):
+        os.fsync(self._file.fileno())
+        self._synced_at = time.monotonic()
+
+    def close(self):
+        if not self._file.closed:
+            self.sync()
+            self._file.close()
+
+
+class CollectingResultSink(BaseResultSink):
+    def __init__(self):
+        self.results: Dict[str, FrameResult] = {}
+
+    def write(self, frame: str, result: FrameResult):
+        self.results[frame] = result
+
+
+class CallbackResultSink(BaseResultSink):
+    def __init__(self, callback: ResultCallback):
+        self._callback = callback
+
+    def write(self, frame: str, result: FrameResult):
+        self._callback(frame, result)
+
+
+def write_results(
+    results: Iterable[Tuple[str, FrameResult]],
+    result_sink: Optional[BaseResultSink] = None,
+) -> Optional[Dict[str, FrameResult]]:
+    # Without a sink results are collected and returned
+    sink = result_sink or CollectingResultSink()
+    for frame, result in results:
+        sink.write(frame, result)
+    return sink.results if result_sink is None else None
+
+
+def iterate_jsonl_results(path: Path) -> Iterator[Tuple[str, FrameResult]]:
+    with open(path) as f:
+        for line in f:
+            if not line.endswith("\n"):
+                # Line is cut by a crash in the middle of writing
+                return
+            record = json.loads(line)
+            yield record["frame"], record["result"]
+
+
+def read_jsonl_results(path: Path) -> Dict[str, FrameResult]:
+    return dict(iterate_jsonl_results(path))
@@ -2,38 +2,105 @@ import shutil
 import time
 import uuid
 from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List
+from typing import List, Tuple, Optional
 
 import numpy as np
-from skimage.io import imread
-from sklearn.metrics import pairwise_distances
-from scipy.sparse import csr_matrix
-from scipy.sparse.csgraph import connected_components
+
+from utils import metrics
+from utils.data_models import CroppedSymbol
+from utils.logger import logger
+
+
+def _normalized_rows(images: List[np.ndarray]) -> np.ndarray:
+    rows = np.stack([image.reshape(-1) for image in images]).astype(np.float32)
+    rows -= rows.mean(axis=1, keepdims=True)
+    norms = np.linalg.norm(rows, axis=1, keepdims=True)
+    np.divide(rows, norms, out=rows, where=norms > 0)
+    return rows
 
 
 class SymbolsAggregator:
+    @staticmethod
+    def _similar_pairs(
+        block: np.ndarray,
+        symbol_images: List[np.ndarray],
+        block_slice: slice,
+        correlation_threshold: float,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        other_block = _normalized_rows(symbol_images[block_slice])
+        rows, columns = np.nonzero(block @ other_block.T > correlation_threshold)
+        return rows, columns + block_slice.start
+
+    @staticmethod
+    def _merge(labels: np.ndarray, rows: np.ndarray, columns: np.ndarray):
+        # labels always point to the smallest index of the component, so that
+        # the final labeling follows the same order as connected_components
+        rows, columns = labels[rows], labels[columns]
+        merged = rows != columns
+        if not merged.any():
+            return labels
+        nodes, inverse = np.unique(
+            np.concatenate([rows[merged], columns[merged]]), return_inverse=True
+        )
+        edges = inverse.reshape(2, -1)
+        from scipy.sparse import coo_matrix
+        from scipy.sparse.csgraph import connected_components
+
+        graph = coo_matrix(
+            (np.ones(edges.shape[1], dtype=np.int8), (edges[0], edges[1])),
+            shape=(len(nodes), len(nodes)),
+        )
+        n_components, components = connected_components(graph, directed=False)
+        roots = np.full(n_components, len(labels))
+        np.minimum.at(roots, components, nodes)
+
+        lookup = np.arange(len(labels))
+        lookup[nodes] = roots[components]
+        return lookup[labels]
+
     @staticmethod
     def collect_symbols(
-        symbol_images: List[np.ndarray], correlation_distance_threshold: float = 0.2
+        symbol_images: List[np.ndarray],
+        correlation_distance_threshold: float = 0.2,
+        block_size: int = 512,
+        n_jobs: int = 1,
     ) -> List[np.ndarray]:
         symbols_shape = symbol_images[0].shape
-        symbol_images = [image.reshape(1, -1) for image in symbol_images]
+        n_symbols = len(symbol_images)
+        correlation_threshold = 1 - correlation_distance_threshold
 
-        print(f"Start computing correlation, number of items {len(symbol_images)}")
+        logger.info(f"Start computing correlation, number of items {n_symbols}")
         s = time.time()
-        cc = pairwise_distances(np.concatenate(symbol_images), metric="correlation")
-        print(f"Finish computing correlation, time {time.time() - s} s")
+        labels = np.arange(n_symbols)
+        with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+            for block_start in range(0, n_symbols, block_size):
+                block = _normalized_rows(
+                    symbol_images[block_start : block_start + block_size]
+                )
+                tiles = executor.map(
+                    lambda other_start: SymbolsAggregator._similar_pairs(
+                        block,
+                        symbol_images,
+                        slice(other_start, other_start + block_size),
+                        correlation_threshold,
+                    ),
+                    range(block_start, n_symbols, block_size),
+                )
+                for rows, columns in tiles:
+                    labels = SymbolsAggregator._merge(
+                        labels, rows + block_start, columns
+                    )
+        correlation_time = time.time() - s
+        metrics.observe("symbols_aggregation.correlation", correlation_time)
+        logger.info(f"Finish computing correlation, time {correlation_time} s")
 
-        print(f"Start analyzing graph")
         s = time.time()
-        graph = csr_matrix((cc < correlation_distance_threshold).astype(int))
-        n_components, labels = connected_components(
-            csgraph=graph, directed=False, return_labels=True
-        )
+        _, labels = np.unique(labels, return_inverse=True)
 
         comps = [comp for comp, n in Counter(labels).items() if n > 5]
-        print(f"Finish analyzing graph, time {time.time() - s} s")
+        metrics.observe("symbols_aggregation.graph", time.time() - s)
 
         output_symbols = []
         for symbol_index, comp in enumerate(comps):
@@ -42,6 +109,71 @@ class SymbolsAggregator:
         return output_symbols
 
 
+class StreamingSymbolsAggregator:
+    def __init__(self, correlation_distance_threshold: float = 0.2):
+        self._correlation_threshold = 1 - correlation_distance_threshold
+        self._representatives: Optional[np.ndarray] = None
+        self._images: List[np.ndarray] = []
+        self._counts: List[int] = []
+
+    def __len__(self) -> int:
+        return len(self._images)
+
+    def add_symbols(self, symbols: List[CroppedSymbol]):
+        self.add_images([symbol.image for symbol in symbols])
+
+    def add_images(self, symbol_images: List[np.ndarray]):
+        if not symbol_images:
+            return
+        rows = _normalized_rows(symbol_images)
+        if self._representatives is not None:
+            similarities = rows @ self._representatives.T
+            best = similarities.argmax(axis=1)
+            matched = similarities[np.arange(len(rows)), best] > (
+                self._correlation_threshold
+            )
+        else:
+            best = np.zeros(len(rows), dtype=int)
+            matched = np.zeros(len(rows), dtype=bool)
+
+        # Rows without a cluster are compared sequentially with clusters created
+        # earlier in the same batch
+        first_new = len(self._images)
+        new_rows = []
+        for index, row in enumerate(rows):
+            if matched[index]:
+                self._counts[best[index]] += 1
+                continue
+            if new_rows:
+                similarities = np.stack(new_rows) @ row
+                new_best = similarities.argmax()
+                if similarities[new_best] > self._correlation_threshold:
+                    self._counts[first_new + new_best] += 1
+                    continue
+            new_rows.append(row)
+            self._images.append(symbol_images[index].copy())
+            self._counts.append(1)
+
+        if new_rows:
+            new_rows = np.stack(new_rows)
+            self._representatives = (
+                new_rows
+                if self._representatives is None
+                else np.concatenate([self._representatives, new_rows])
+            )
+
+    def collect_symbols(self, min_count: int = 5) -> List[np.ndarray]:
+        return [
+            image
+            for image, count in zip(self._images, self._counts)
+            if count > min_count
+        ]
+
+    @property
+    def counts(self) -> List[int]:
+        return list(self._counts)
+
+
 if __name__ == "__main__":
     from utils.io import read_all_symbols, save_images_set
 
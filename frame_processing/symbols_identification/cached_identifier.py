@@ -0,0 +1,188 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional, List, Dict, Tuple
+
+import numpy as np
+
+from frame_processing.symbols_identification.symbols_identifier import (
+    BaseSymbolIdentifier,
+    BatchSymbolIdentifier,
+)
+from utils.data_models import CroppedSymbol, ExpectedSymbol
+from utils import metrics
+from utils.logger import logger
+
+
+def image_key(image: np.ndarray, quantization_shift: int = 2) -> str:
+    if image.dtype == np.uint8 and quantization_shift > 0:
+        image = np.right_shift(image, quantization_shift)
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(str(image.shape).encode())
+    digest.update(np.ascontiguousarray(image).tobytes())
+    return digest.hexdigest()
+
+
+def expected_symbols_fingerprint(
+    expected_symbols: List[ExpectedSymbol], signature: str = ""
+) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(signature.encode())
+    for expected_symbol in expected_symbols:
+        digest.update(expected_symbol.name.encode())
+        digest.update(np.ascontiguousarray(expected_symbol.image).tobytes())
+    return digest.hexdigest()
+
+
+def _symbol_name(expected_symbol: Optional[ExpectedSymbol]) -> Optional[str]:
+    return None if expected_symbol is None else expected_symbol.name
+
+
+class CachedSymbolIdentifier(BatchSymbolIdentifier):
+    def __init__(
+        self,
+        symbol_identifier: BaseSymbolIdentifier,
+        expected_symbols: List[ExpectedSymbol],
+        max_size: int = 4096,
+        quantization_shift: int = 2,
+        cache_path: Optional[Path] = None,
+    ):
+        self._symbol_identifier = symbol_identifier
+        self._expected_symbols: Dict[str, ExpectedSymbol] = {
+            expected_symbol.name: expected_symbol
+            for expected_symbol in expected_symbols
+        }
+        self._max_size = max_size
+        self._quantization_shift = quantization_shift
+        self._fingerprint = expected_symbols_fingerprint(
+            expected_symbols, self.cache_signature()
+        )
+        self._cache_path = cache_path
+        self._cache: "OrderedDict[str, Optional[ExpectedSymbol]]" = OrderedDict()
+        # Shared by identification threads of live sessions
+        self._lock = threading.Lock()
+        # Identifications made since the last drain, for a pool worker to send
+        # them to the cache of the parent process
+        self._new_entries: Optional[List[Tuple[str, Optional[str]]]] = None
+        self.hits = 0
+        self.misses = 0
+
+        if cache_path is not None and cache_path.exists():
+            self.load(cache_path)
+
+    def __getstate__(self) -> dict:
+        # Lock can not be pickled, identifiers are sent to pool workers
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state: dict):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    def cache_signature(self) -> str:
+        return (
+            f"{type(self).__name__}({self._symbol_identifier.cache_signature()}, "
+            f"quantization_shift={self._quantization_shift})"
+        )
+
+    def _put(self, key: str, expected_symbol: Optional[ExpectedSymbol]):
+        self._cache[key] = expected_symbol
+        self._cache.move_to_end(key)
+        if len(self._cache) > self._max_size:
+            self._cache.popitem(last=False)
+
+    def identify_symbols(
+        self, symbols: List[CroppedSymbol]
+    ) -> List[Optional[ExpectedSymbol]]:
+        keys = [image_key(s.image, self._quantization_shift) for s in symbols]
+        result: List[Optional[ExpectedSymbol]] = [None] * len(symbols)
+        missed = []
+        with self._lock:
+            for index, key in enumerate(keys):
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+                    result[index] = self._cache[key]
+                    self.hits += 1
+                else:
+                    missed.append(index)
+                    self.misses += 1
+        metrics.increment("identification_cache.hits", len(symbols) - len(missed))
+        metrics.increment("identification_cache.misses", len(missed))
+
+        if missed:
+            missed_symbols = [symbols[index] for index in missed]
+            if isinstance(self._symbol_identifier, BatchSymbolIdentifier):
+                identified = self._symbol_identifier.identify_symbols(missed_symbols)
+            else:
+                identified = [
+                    self._symbol_identifier.identify_symbol(symbol)
+                    for symbol in missed_symbols
+                ]
+            with self._lock:
+                for index, expected_symbol in zip(missed, identified):
+                    result[index] = expected_symbol
+                    self._put(keys[index], expected_symbol)
+                    if self._new_entries is not None:
+                        self._new_entries.append(
+                            (keys[index], _symbol_name(expected_symbol))
+                        )
+        return result
+
+    def track_new_entries(self):
+        with self._lock:
+            if self._new_entries is None:
+                self._new_entries = []
+
+    def drain_new_entries(self) -> List[Tuple[str, Optional[str]]]:
+        with self._lock:
+            entries = self._new_entries or []
+            if self._new_entries is not None:
+                self._new_entries = []
+        return entries
+
+    def add_entries(self, entries: List[Tuple[str, Optional[str]]]):
+        with self._lock:
+            for key, name in entries:
+                if name is None:
+                    self._put(key, None)
+                elif name in self._expected_symbols:
+                    self._put(key, self._expected_symbols[name])
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def load(self, cache_path: Path):
+        with open(cache_path) as f:
+            data = json.load(f)
+        if data.get("fingerprint") != self._fingerprint:
+            logger.info(
+                f"Cache {cache_path} is built for other expected symbols "
+                f"or identifier settings"
+            )
+            return
+        self.add_entries(data["entries"])
+        logger.info(f"Loaded {len(self._cache)} cached identifications")
+
+    def save(self, cache_path: Optional[Path] = None):
+        cache_path = cache_path or self._cache_path
+        if cache_path is None:
+            raise ValueError("Cache path is not specified")
+        with self._lock:
+            entries = [
+                [key, _symbol_name(expected_symbol)]
+                for key, expected_symbol in self._cache.items()
+            ]
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = cache_path.with_suffix(cache_path.suffix + ".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(dict(fingerprint=self._fingerprint, entries=entries), f)
+        tmp_path.replace(cache_path)
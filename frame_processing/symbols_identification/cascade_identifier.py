@@ -0,0 +1,133 @@
+import time
+from typing import Optional, List, Tuple, TYPE_CHECKING
+
+import numpy as np
+
+from frame_processing.symbols_identification.symbols_identifier import (
+    BaseSymbolIdentifier,
+    TemplatesGroup,
+)
+from utils.custom_metrics import template_interior, normalized_correlation_maps
+from utils.data_models import ExpectedSymbol, CroppedSymbol
+from utils import metrics
+from utils.logger import logger
+
+if TYPE_CHECKING:
+    from frame_processing.symbols_identification.symbols_pack import SymbolsPack
+
+
+def thumbnail_features(image: np.ndarray, size: Tuple[int, int]) -> np.ndarray:
+    import cv2
+
+    thumbnail = cv2.resize(
+        np.ascontiguousarray(image[:, :, :3]), size, interpolation=cv2.INTER_AREA
+    )
+    features = thumbnail.astype(np.float32).ravel()
+    features -= features.mean()
+    norm = np.linalg.norm(features)
+    if norm > 0:
+        features /= norm
+    return features
+
+
+class CascadeSymbolIdentifier(BaseSymbolIdentifier):
+    METRIC_THRESHOLD = 0.7
+
+    def __init__(
+        self,
+        expected_symbols: List[ExpectedSymbol],
+        top_k: int = 3,
+        frequency_weight: float = 0.05,
+        thumbnail_size: Tuple[int, int] = (16, 12),
+        windows_part: float = 0.1,
+        windows_step: int = 3,
+        interiors: Optional[List[np.ndarray]] = None,
+        features: Optional[np.ndarray] = None,
+    ):
+        self._expected_symbols = expected_symbols
+        self._top_k = top_k
+        self._frequency_weight = frequency_weight
+        self._thumbnail_size = thumbnail_size
+        self._windows_part = windows_part
+        self._windows_step = windows_step
+
+        if features is None:
+            features = np.stack(
+                [thumbnail_features(s.image, thumbnail_size) for s in expected_symbols]
+            )
+        if interiors is None:
+            interiors = [
+                template_interior(s.image, windows_part) for s in expected_symbols
+            ]
+        self._features = features
+        self._templates = [
+            TemplatesGroup([index], [interior])
+            for index, interior in enumerate(interiors)
+        ]
+        self._hits = np.zeros(len(expected_symbols))
+        self.full_correlations = 0
+        self.identifications = 0
+
+    def cache_signature(self) -> str:
+        return (
+            f"{type(self).__name__}(threshold={self.METRIC_THRESHOLD}, "
+            f"top_k={self._top_k}, frequency_weight={self._frequency_weight}, "
+            f"thumbnail_size={tuple(self._thumbnail_size)}, "
+            f"windows_part={self._windows_part}, windows_step={self._windows_step})"
+        )
+
+    @classmethod
+    def from_pack(
+        cls, pack: "SymbolsPack", top_k: int = 3, frequency_weight: float = 0.05
+    ) -> "CascadeSymbolIdentifier":
+        return cls(
+            pack.expected_symbols(),
+            top_k=top_k,
+            frequency_weight=frequency_weight,
+            thumbnail_size=pack.thumbnail_size,
+            windows_part=pack.windows_part,
+            interiors=pack.interiors,
+            features=pack.thumbnails,
+        )
+
+    def _candidates(self, image: np.ndarray) -> np.ndarray:
+        scores = self._features @ thumbnail_features(image, self._thumbnail_size)
+        if self._hits.sum() > 0:
+            scores = scores + self._frequency_weight * self._hits / self._hits.sum()
+        return np.argsort(-scores)[: self._top_k]
+
+    def _score(self, image: np.ndarray, index: int) -> float:
+        self.full_correlations += 1
+        metrics.increment("symbols_identification.full_correlations")
+        template = self._templates[index]
+        maps = normalized_correlation_maps(
+            image[None, :, :, 0],
+            template.centered,
+            template.norms,
+            windows_step=self._windows_step,
+            spectrum=template.spectrum(image.shape[:2]),
+        )
+        return float(maps.max())
+
+    def identify_symbol(self, symbol: CroppedSymbol) -> Optional[ExpectedSymbol]:
+        s = time.perf_counter()
+        self.identifications += 1
+        candidates = self._candidates(symbol.image)
+        for processed, index in enumerate(candidates, start=1):
+            if self._score(symbol.image, index) > self.METRIC_THRESHOLD:
+                self._hits[index] += 1
+                logger.debug(
+                    "For element %s identified %s. Processed %s candidates. Time: %s",
+                    symbol.index.coordinate,
+                    self._expected_symbols[index].name,
+                    processed,
+                    time.perf_counter() - s,
+                )
+                return self._expected_symbols[index]
+        logger.debug(
+            "For element %s not identified expected_symbol. "
+            "Processed %s candidates. Time: %s",
+            symbol.index.coordinate,
+            len(candidates),
+            time.perf_counter() - s,
+        )
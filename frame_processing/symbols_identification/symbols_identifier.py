@@ -1,49 +1,298 @@
 import time
-from typing import Optional, List
+from collections import defaultdict
+from typing import Optional, List, Dict, Tuple, Iterable, TYPE_CHECKING
+
+import numpy as np
 
 from utils.data_models import ExpectedSymbol, CroppedSymbol, Reel, Vector
-from utils.custom_metrics import window_correlation
+from utils.custom_metrics import (
+    template_interior,
+    center_templates,
+    templates_spectrum,
+    normalized_correlation_maps,
+    downscale,
+    pyramid_correlation_scores,
+    block_templates,
+    threshold_query,
+)
+from utils import metrics
 from utils.logger import logger
 from abc import abstractmethod
 
+if TYPE_CHECKING:
+    from frame_processing.symbols_identification.symbols_pack import SymbolsPack
+
 
 class BaseSymbolIdentifier:
     @abstractmethod
     def identify_symbol(self, symbol: CroppedSymbol):
         pass
 
+    def cache_signature(self) -> str:
+        # Settings the identification results depend on, persisted caches of
+        # results are discarded when it changes
+        return type(self).__name__
+
+
+class BatchSymbolIdentifier(BaseSymbolIdentifier):
+    @abstractmethod
+    def identify_symbols(
+        self, symbols: List[CroppedSymbol]
+    ) -> List[Optional[ExpectedSymbol]]:
+        pass
+
+    def identify_symbol(self, symbol: CroppedSymbol) -> Optional[ExpectedSymbol]:
+        return self.identify_symbols([symbol])[0]
+
+
+class TemplatesGroup:
+    def __init__(self, indices: List[int], interiors: List[np.ndarray]):
+        self.indices = np.array(indices)
+        self.centered, self.norms = center_templates(np.stack(interiors))
+        self._spectrums: Dict[Tuple[int, int], np.ndarray] = {}
+        self._coarse: Dict[int, "TemplatesGroup"] = {}
+        self._blocks: Dict[int, Tuple[np.ndarray, np.ndarray, np.ndarray]] = {}
+        self._blocks_spectrums: Dict[Tuple[int, Tuple[int, int]], np.ndarray] = {}
+
+    def spectrum(self, image_shape: Tuple[int, int]) -> np.ndarray:
+        if image_shape not in self._spectrums:
+            self._spectrums[image_shape] = templates_spectrum(
+                self.centered, image_shape
+            )
+        return self._spectrums[image_shape]
+
+    def coarse(self, factor: int) -> "TemplatesGroup":
+        if factor not in self._coarse:
+            self._coarse[factor] = TemplatesGroup(
+                list(self.indices), list(downscale(self.centered, factor))
+            )
+        return self._coarse[factor]
+
+    def blocks(self, block: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        if block not in self._blocks:
+            self._blocks[block] = block_templates(self.centered, block)
+        return self._blocks[block]
+
+    def blocks_spectrum(self, block: int, image_shape: Tuple[int, int]) -> np.ndarray:
+        key = (block, image_shape)
+        if key not in self._blocks_spectrums:
+            coarse_shape = tuple(size // block for size in image_shape)
+            self._blocks_spectrums[key] = templates_spectrum(
+                self.blocks(block)[0], coarse_shape
+            )
+        return self._blocks_spectrums[key]
 
-class CorrSymbolIdentifier(BaseSymbolIdentifier):
+
+class CorrSymbolIdentifier(BatchSymbolIdentifier):
     METRIC_THRESHOLD = 0.7
+    SEARCH_MODES = ("threshold", "exhaustive", "pyramid")
+    # Coarse scores are at most ~0.01 lower than full scale ones
+    PYRAMID_MARGIN = 0.1
 
-    def __init__(self, expected_symbols: List[ExpectedSymbol]):
+    def __init__(
+        self,
+        expected_symbols: List[ExpectedSymbol],
+        windows_part: float = 0.1,
+        windows_step: int = 3,
+        interiors: Optional[List[np.ndarray]] = None,
+        search_mode: str = "threshold",
+        pyramid_factor: int = 2,
+        pyramid_candidates: int = 3,
+    ):
+        if search_mode not in self.SEARCH_MODES:
+            raise ValueError(
+                f"Unknown search mode {search_mode}, expected one of {self.SEARCH_MODES}"
+            )
         self._expected_symbols = expected_symbols
+        self._windows_part = windows_part
+        self._windows_step = windows_step
+        self._search_mode = search_mode
+        self._pyramid_factor = pyramid_factor
+        self._pyramid_candidates = pyramid_candidates
+        self.windows_evaluated = 0
 
-    def identify_symbol(self, symbol: CroppedSymbol) -> Optional[ExpectedSymbol]:
-        s = time.time()
-        for index, expected_symbol in enumerate(self._expected_symbols):
-            score = window_correlation(symbol.image, expected_symbol.image)
-            if score > self.METRIC_THRESHOLD:
-                logger.debug(
-                    f"For element {symbol.index.coordinate} identified {expected_symbol.name}. "
-                    f"Processed {index + 1} expected symbols. Time: {time.time() - s}"
+        if interiors is None:
+            interiors = [
+                template_interior(s.image, windows_part) for s in expected_symbols
+            ]
+        interiors_by_shape = defaultdict(list)
+        for index, interior in enumerate(interiors):
+            interiors_by_shape[interior.shape].append((index, interior))
+        self._templates_groups = [
+            TemplatesGroup(*zip(*items)) for items in interiors_by_shape.values()
+        ]
+
+    def cache_signature(self) -> str:
+        return (
+            f"{type(self).__name__}(threshold={self.METRIC_THRESHOLD}, "
+            f"windows_part={self._windows_part}, windows_step={self._windows_step}, "
+            f"search_mode={self._search_mode}, "
+            f"pyramid_factor={self._pyramid_factor}, "
+            f"pyramid_candidates={self._pyramid_candidates})"
+        )
+
+    @classmethod
+    def from_pack(
+        cls, pack: "SymbolsPack", windows_step: int = 3, **kwargs
+    ) -> "CorrSymbolIdentifier":
+        return cls(
+            pack.expected_symbols(),
+            windows_part=pack.windows_part,
+            windows_step=windows_step,
+            interiors=pack.interiors,
+            **kwargs,
+        )
+
+    def _scores(self, images: np.ndarray) -> np.ndarray:
+        scores = np.zeros((len(images), len(self._expected_symbols)), np.float32)
+        for group in self._templates_groups:
+            if self._search_mode == "pyramid":
+                coarse = group.coarse(self._pyramid_factor)
+                coarse_shape = tuple(
+                    size // self._pyramid_factor for size in images.shape[1:]
                 )
-                return expected_symbol
-        else:
-            logger.debug(
-                f"For element {symbol.index.coordinate} not identified expected_symbol. "
-                f"Processed {len(self._expected_symbols)} expected symbols. Time: {time.time() - s}"
+                scores[:, group.indices] = pyramid_correlation_scores(
+                    images,
+                    group.centered,
+                    group.norms,
+                    coarse.centered,
+                    coarse.norms,
+                    factor=self._pyramid_factor,
+                    candidates=self._pyramid_candidates,
+                    coarse_spectrum=coarse.spectrum(coarse_shape),
+                    refine_above=self.METRIC_THRESHOLD - self.PYRAMID_MARGIN,
+                )
+                continue
+            maps = normalized_correlation_maps(
+                images,
+                group.centered,
+                group.norms,
+                windows_step=self._windows_step,
+                spectrum=group.spectrum(images.shape[1:]),
             )
+            scores[:, group.indices] = maps.max(axis=(2, 3))
+        return scores
+
+    def _threshold_identify(self, images: np.ndarray) -> List[Optional[ExpectedSymbol]]:
+        found = np.full(len(images), len(self._expected_symbols))
+        for group in self._templates_groups:
+            group_found, evaluated = threshold_query(
+                images,
+                group.centered,
+                group.norms,
+                self.METRIC_THRESHOLD,
+                windows_step=self._windows_step,
+                blocks=group.blocks(self._windows_step),
+                blocks_spectrum=group.blocks_spectrum(
+                    self._windows_step, images.shape[1:]
+                ),
+            )
+            found = np.where(
+                group_found >= 0,
+                np.minimum(found, group.indices[group_found]),
+                found,
+            )
+            self.windows_evaluated += int(evaluated.sum())
+            metrics.increment(
+                "symbols_identification.windows_evaluated", int(evaluated.sum())
+            )
+        return [
+            (
+                self._expected_symbols[index]
+                if index < len(self._expected_symbols)
+                else None
+            )
+            for index in found
+        ]
+
+    def _identify(self, images: np.ndarray) -> List[Optional[ExpectedSymbol]]:
+        if self._search_mode == "threshold":
+            return self._threshold_identify(images)
+        passed = self._scores(images) > self.METRIC_THRESHOLD
+        return [
+            (
+                self._expected_symbols[symbol_passed.argmax()]
+                if symbol_passed.any()
+                else None
+            )
+            for symbol_passed in passed
+        ]
+
+    def identify_images(self, images: np.ndarray) -> List[Optional[ExpectedSymbol]]:
+        # Images tensor of shape (..., height, width, channels), e.g. a grid cells view
+        with metrics.timer("symbols_identification.batch"):
+            return self._identify(images[..., 0].reshape((-1,) + images.shape[-3:-1]))
+
+    def identify_symbols(
+        self, symbols: List[CroppedSymbol]
+    ) -> List[Optional[ExpectedSymbol]]:
+        s = time.perf_counter()
+        symbols_by_shape = defaultdict(list)
+        for index, symbol in enumerate(symbols):
+            symbols_by_shape[symbol.image.shape[:2]].append(index)
+
+        result: List[Optional[ExpectedSymbol]] = [None] * len(symbols)
+        for indices in symbols_by_shape.values():
+            images = np.stack([symbols[index].image[:, :, 0] for index in indices])
+            for index, expected_symbol in zip(indices, self._identify(images)):
+                result[index] = expected_symbol
+
+        elapsed = time.perf_counter() - s
+        metrics.observe("symbols_identification.batch", elapsed)
+        logger.debug(
+            "Identified %s of %s symbols against %s expected symbols. Time: %s",
+            len(result) - result.count(None),
+            len(symbols),
+            len(self._expected_symbols),
+            elapsed,
+        )
+        return result
 
 
 class SymbolsProcessor:
-    def __init__(self, symbol_identifier: BaseSymbolIdentifier):
+    # Mean absolute difference of cell signatures in gray levels, above which
+    # a cell is considered changed. Compression noise stays well below it
+    CHANGE_THRESHOLD = 10.0
+    SIGNATURE_STEP = 4
+
+    def __init__(
+        self,
+        symbol_identifier: BaseSymbolIdentifier,
+        incremental: bool = False,
+        full_check_every: int = 30,
+    ):
         self._symbol_identifier = symbol_identifier
+        self._incremental = incremental
+        self._full_check_every = full_check_every
+        # Signature of the cell image at its last identification and the result
+        self._previous_cells: Dict[
+            Tuple[int, int], Tuple[np.ndarray, ExpectedSymbol]
+        ] = {}
+        self._frames_since_full_check = 0
+        self.last_frame_counts = dict(reused=0, reidentified=0)
+        self.reused_cells = 0
+        self.reidentified_cells = 0
+
+    @property
+    def symbol_identifier(self) -> BaseSymbolIdentifier:
+        return self._symbol_identifier
 
     def process_frames_symbols(
         self, symbols: List[CroppedSymbol]
     ) -> Optional[List[Reel]]:
-        g_s = time.time()
+        with metrics.timer("symbols_identification.frame"):
+            reels = self._process_frames_symbols(symbols)
+        metrics.increment("symbols_identification.cells", len(symbols))
+        metrics.increment(
+            "symbols_identification.identified_frames"
+            if reels is not None
+            else "symbols_identification.invalid_frames"
+        )
+        return reels
+
+    def _process_frames_symbols(
+        self, symbols: List[CroppedSymbol]
+    ) -> Optional[List[Reel]]:
         current_frame = symbols[0].frame
 
         if any(symbol.frame != current_frame for symbol in symbols):
@@ -57,8 +306,12 @@ class SymbolsProcessor:
             Reel.create_empty(frame=current_frame, index=index)
             for index in range(grid_size.x)
         ]
-        for symbol in symbols:
-            expected_symbol = self._symbol_identifier.identify_symbol(symbol)
+        if self._incremental:
+            expected_symbols = self._identify_changed(symbols)
+        else:
+            expected_symbols = self._identify(symbols)
+
+        for symbol, expected_symbol in zip(symbols, expected_symbols):
             if expected_symbol is None:
                 logger.info(
                     f"In frame {current_frame} symbol with index {symbol.index.coordinate} is not detected. "
@@ -66,9 +319,74 @@ class SymbolsProcessor:
                 )
                 return None
             reels[symbol.index.x].add_symbol(symbol.index.y, expected_symbol)
-        logger.debug(f"Time of processing one frame: {time.time() - g_s}")
         return reels
 
+    def _identify(
+        self, symbols: List[CroppedSymbol]
+    ) -> Iterable[Optional[ExpectedSymbol]]:
+        if isinstance(self._symbol_identifier, BatchSymbolIdentifier):
+            return self._symbol_identifier.identify_symbols(symbols)
+        return map(self._symbol_identifier.identify_symbol, symbols)
+
+    def _signature(self, image: np.ndarray) -> np.ndarray:
+        return image[:: self.SIGNATURE_STEP, :: self.SIGNATURE_STEP, 0].astype(
+            np.float32
+        )
+
+    def _is_unchanged(self, previous: np.ndarray, current: np.ndarray) -> bool:
+        return (
+            previous.shape == current.shape
+            and np.abs(previous - current).mean() <= self.CHANGE_THRESHOLD
+        )
+
+    def _identify_changed(
+        self, symbols: List[CroppedSymbol]
+    ) -> List[Optional[ExpectedSymbol]]:
+        full_check = self._frames_since_full_check >= self._full_check_every
+        self._frames_since_full_check = (
+            0 if full_check else self._frames_since_full_check + 1
+        )
+
+        signatures = [self._signature(symbol.image) for symbol in symbols]
+        result: List[Optional[ExpectedSymbol]] = [None] * len(symbols)
+        changed = []
+        for index, (symbol, signature) in enumerate(zip(symbols, signatures)):
+            previous = self._previous_cells.get(symbol.index.coordinate)
+            if (
+                not full_check
+                and previous is not None
+                and self._is_unchanged(previous[0], signature)
+            ):
+                result[index] = previous[1]
+            else:
+                changed.append(index)
+
+        identified = self._identify([symbols[index] for index in changed])
+        for index, expected_symbol in zip(changed, identified):
+            result[index] = expected_symbol
+            cell = symbols[index].index.coordinate
+            if expected_symbol is None:
+                self._previous_cells.pop(cell, None)
+            else:
+                self._previous_cells[cell] = (signatures[index], expected_symbol)
+
+        self.last_frame_counts = dict(
+            reused=len(symbols) - len(changed), reidentified=len(changed)
+        )
+        self.reused_cells += len(symbols) - len(changed)
+        self.reidentified_cells += len(changed)
+        metrics.increment(
+            "symbols_identification.reused_cells", len(symbols) - len(changed)
+        )
+        metrics.increment("symbols_identification.reidentified_cells", len(changed))
+        logger.debug(
+            "Frame %s: reused %s cells, re-identified %s cells",
+            symbols[0].frame,
+            len(symbols) - len(changed),
+            len(changed),
+        )
+        return result
+
 
 if __name__ == "__main__":
     from utils.io import read_expected_symbols, read_cropped_symbols
@@ -0,0 +1,142 @@
+import argparse
+import hashlib
+from pathlib import Path
+from typing import List, Tuple, Optional
+
+import numpy as np
+
+from frame_processing.symbols_identification.cascade_identifier import (
+    thumbnail_features,
+)
+from utils.custom_metrics import template_interior
+from utils.data_models import ExpectedSymbol
+from utils.io import read_expected_symbols
+from utils.logger import logger
+
+# Bumped when the preprocessing changes, so that old packs are recompiled
+PACK_VERSION = 1
+
+
+def symbols_folder_hash(
+    symbols_folder: Path, windows_part: float, thumbnail_size: Tuple[int, int]
+) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{PACK_VERSION};{windows_part};{thumbnail_size}".encode())
+    for path in sorted(symbols_folder.iterdir()):
+        if path.is_file():
+            digest.update(path.name.encode())
+            digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+class SymbolsPack:
+    def __init__(
+        self,
+        names: List[str],
+        images: List[np.ndarray],
+        interiors: List[np.ndarray],
+        thumbnails: np.ndarray,
+        windows_part: float,
+        thumbnail_size: Tuple[int, int],
+        source_hash: str,
+    ):
+        self.names = names
+        self.images = images
+        self.interiors = interiors
+        self.thumbnails = thumbnails
+        self.windows_part = windows_part
+        self.thumbnail_size = thumbnail_size
+        self.source_hash = source_hash
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def expected_symbols(self) -> List[ExpectedSymbol]:
+        return [
+            ExpectedSymbol(name=name, image=image)
+            for name, image in zip(self.names, self.images)
+        ]
+
+    def save(self, pack_path: Path):
+        pack_path.parent.mkdir(parents=True, exist_ok=True)
+        arrays = dict(
+            names=np.array(self.names, dtype=str),
+            thumbnails=self.thumbnails,
+            windows_part=np.array(self.windows_part),
+            thumbnail_size=np.array(self.thumbnail_size),
+            source_hash=np.array(self.source_hash),
+        )
+        for index, (image, interior) in enumerate(zip(self.images, self.interiors)):
+            arrays[f"image_{index}"] = image
+            arrays[f"interior_{index}"] = interior
+        tmp_path = pack_path.with_name(pack_path.name + ".tmp")
+        with open(tmp_path, "wb") as f:
+            np.savez(f, **arrays)
+        tmp_path.replace(pack_path)
+
+    @classmethod
+    def load(cls, pack_path: Path) -> "SymbolsPack":
+        with np.load(pack_path) as data:
+            names = data["names"].tolist()
+            return cls(
+                names=names,
+                images=[data[f"image_{index}"] for index in range(len(names))],
+                interiors=[data[f"interior_{index}"] for index in range(len(names))],
+                thumbnails=data["thumbnails"],
+                windows_part=float(data["windows_part"]),
+                thumbnail_size=tuple(data["thumbnail_size"].tolist()),
+                source_hash=str(data["source_hash"]),
+            )
+
+
+def compile_symbols_pack(
+    symbols_folder: Path,
+    windows_part: float = 0.1,
+    thumbnail_size: Tuple[int, int] = (16, 12),
+) -> SymbolsPack:
+    expected_symbols = read_expected_symbols(symbols_folder)
+    return SymbolsPack(
+        names=[s.name for s in expected_symbols],
+        images=[s.image for s in expected_symbols],
+        interiors=[template_interior(s.image, windows_part) for s in expected_symbols],
+        thumbnails=np.stack(
+            [thumbnail_features(s.image, thumbnail_size) for s in expected_symbols]
+        ),
+        windows_part=windows_part,
+        thumbnail_size=thumbnail_size,
+        source_hash=symbols_folder_hash(symbols_folder, windows_part, thumbnail_size),
+    )
+
+
+def load_symbols_pack(
+    symbols_folder: Path,
+    pack_path: Path,
+    windows_part: float = 0.1,
+    thumbnail_size: Tuple[int, int] = (16, 12),
+) -> SymbolsPack:
+    source_hash = symbols_folder_hash(symbols_folder, windows_part, thumbnail_size)
+    pack: Optional[SymbolsPack] = None
+    if pack_path.exists():
+        pack = SymbolsPack.load(pack_path)
+        if pack.source_hash != source_hash:
+            logger.info(f"Symbols pack {pack_path} is outdated, recompiling")
+            pack = None
+    if pack is None:
+        pack = compile_symbols_pack(symbols_folder, windows_part, thumbnail_size)
+        pack.save(pack_path)
+    return pack
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compile expected symbols pack")
+    parser.add_argument("symbols", type=Path, help="Folder with expected symbols")
+    parser.add_argument("output", type=Path, help="Path of the pack file")
+    parser.add_argument("--windows-part", type=float, default=0.1)
+    parser.add_argument("--thumbnail-size", type=int, nargs=2, default=(16, 12))
+    arguments = parser.parse_args()
+
+    compiled = compile_symbols_pack(
+        arguments.symbols, arguments.windows_part, tuple(arguments.thumbnail_size)
+    )
+    compiled.save(arguments.output)
+    logger.info(f"Compiled {len(compiled)} symbols into {arguments.output}")
@@ -0,0 +1,64 @@
+import multiprocessing
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Optional, Tuple
+
+from utils import metrics
+from utils.state import (
+    get_debug_dir,
+    is_debug_mode_activated,
+    set_debug_dir,
+    set_debug_mode,
+)
+
+# Objects sent once per worker by the pool initializer, tasks carry only their data
+worker_state = {}
+
+
+def _init_worker(state: dict, debug: bool, debug_dir: Path, metrics_enabled: bool):
+    # Settings changed by the parent at runtime are not in the environment that
+    # spawned workers start from
+    set_debug_mode(debug)
+    if debug:
+        set_debug_dir(debug_dir)
+    metrics.set_metrics_enabled(metrics_enabled)
+    worker_state.update(state)
+
+
+def create_process_pool(workers: int, **state) -> ProcessPoolExecutor:
+    # Spawn, since the parent decodes frames in background threads
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(
+            state,
+            is_debug_mode_activated(),
+            get_debug_dir(),
+            metrics.is_metrics_enabled(),
+        ),
+    )
+
+
+def _run_task(function: Callable, *args) -> Tuple[Any, Optional[dict]]:
+    result = function(*args)
+    return result, metrics.registry.drain() if metrics.is_metrics_enabled() else None
+
+
+def submit(executor: Executor, function: Callable, *args) -> Future:
+    # Metrics recorded by the task in the worker are merged into the metrics of
+    # this process when its result arrives
+    future = Future()
+
+    def on_done(task: Future):
+        try:
+            result, worker_metrics = task.result()
+        except BaseException as e:
+            future.set_exception(e)
+            return
+        if worker_metrics is not None:
+            metrics.registry.merge(worker_metrics)
+        future.set_result(result)
+
+    executor.submit(_run_task, function, *args).add_done_callback(on_done)
+    return future
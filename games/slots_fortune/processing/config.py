@@ -0,0 +1,13 @@
+from pathlib import Path
+
+from utils.data_models import SymbolsGrid, Vector, ROI
+
+SYMBOLS_DIR = Path(__file__).parent.parent / "symbols"
+
+GRID = SymbolsGrid(
+    start_point=Vector(x=45, y=85),
+    symbol_size=Vector(x=185, y=140),
+    offset=Vector(x=0, y=20),
+    number_of_elements=Vector(x=5, y=3),
+)
+SCREEN_ROI = ROI(450, 1500, 129, 729)
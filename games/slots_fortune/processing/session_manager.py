@@ -0,0 +1,288 @@
+import argparse
+import contextlib
+import itertools
+import queue
+import threading
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, Iterator, Optional, Tuple
+
+from frame_processing.result_sinks import BaseResultSink, write_results
+from games.slots_fortune.processing.slots_fortune import LiveProcessor
+from utils import metrics
+from utils.logger import logger
+from utils.spin_results import FrameResult
+
+# Creates a live processor with the given name, identifying on the executor
+SessionFactory = Callable[[str, Executor], LiveProcessor]
+
+
+class SessionState:
+    def __init__(self, name: str):
+        self.name = name
+        self.restarts = 0
+        self.frames = 0
+        self.identified_frames = 0
+        self.failed = False
+        self.processor: Optional[LiveProcessor] = None
+        self.finished_spins = 0
+
+    @property
+    def spins(self) -> int:
+        processor = self.processor
+        current = processor.summary()["spins"] if processor is not None else 0
+        return self.finished_spins + current
+
+
+class SessionManager:
+    def __init__(
+        self,
+        session_factory: SessionFactory,
+        sessions: int,
+        workers: int = 4,
+        max_restarts: int = 5,
+        restart_delay: float = 1.0,
+        max_restart_delay: float = 60.0,
+        report_interval: float = 30.0,
+    ):
+        self._session_factory = session_factory
+        self._workers = workers
+        self._max_restarts = max_restarts
+        self._restart_delay = restart_delay
+        self._max_restart_delay = max_restart_delay
+        self._report_interval = report_interval
+        self.sessions = [SessionState(f"session_{index}") for index in range(sessions)]
+        self._stop = threading.Event()
+        self._started_at: Optional[float] = None
+
+    def stop(self):
+        self._stop.set()
+
+    def summary(self) -> dict:
+        elapsed = time.monotonic() - self._started_at if self._started_at else 0.0
+        spins = sum(session.spins for session in self.sessions)
+        return dict(
+            sessions=len(self.sessions),
+            failed_sessions=sum(session.failed for session in self.sessions),
+            restarts=sum(session.restarts for session in self.sessions),
+            spins=spins,
+            spins_per_minute=spins / elapsed * 60 if elapsed else 0.0,
+            frames=sum(session.frames for session in self.sessions),
+            identified_frames=sum(
+                session.identified_frames for session in self.sessions
+            ),
+        )
+
+    def _log_summary(self):
+        summary = self.summary()
+        logger.info(
+            f"Spins per minute: {summary['spins_per_minute']:.1f}, "
+            f"spins: {summary['spins']}, "
+            f"identified frames: {summary['identified_frames']}/{summary['frames']}, "
+            f"restarts: {summary['restarts']}, "
+            f"failed sessions: {summary['failed_sessions']}"
+        )
+
+    def run(
+        self, interval: float, result_sink: Optional[BaseResultSink] = None
+    ) -> Optional[Dict[str, FrameResult]]:
+        return write_results(self.iterate_results(interval), result_sink)
+
+    def iterate_results(self, interval: float) -> Iterator[Tuple[str, FrameResult]]:
+        # Sessions put their results and None when they end, results are written
+        # by the consumer of this iterator only
+        results = queue.Queue()
+        self._stop.clear()
+        self._started_at = time.monotonic()
+        deadline = self._started_at + interval
+        # One identifier with one copy of the templates serves all sessions, the
+        # heavy parts of identification release the GIL. A session waits for the
+        # result of its frame before it captures the next one, so it has at most
+        # one frame in the pool and a slow pool slows down capture
+        with ThreadPoolExecutor(
+            max_workers=self._workers, thread_name_prefix="identification"
+        ) as pool:
+            threads = [
+                threading.Thread(
+                    target=self._run_session,
+                    args=(session, pool),
+                    kwargs=dict(deadline=deadline, results=results),
+                    name=session.name,
+                    daemon=True,
+                )
+                for session in self.sessions
+            ]
+            for thread in threads:
+                thread.start()
+            try:
+                yield from self._collect(results, len(threads))
+            finally:
+                self._stop.set()
+                for thread in threads:
+                    thread.join()
+        self._log_summary()
+
+    def _collect(
+        self,
+        results: queue.Queue,
+        sessions: int,
+    ) -> Iterator[Tuple[str, FrameResult]]:
+        next_report = time.monotonic() + self._report_interval
+        while sessions:
+            try:
+                result = results.get(timeout=max(next_report - time.monotonic(), 0))
+            except queue.Empty:
+                pass
+            else:
+                if result is None:
+                    sessions -= 1
+                else:
+                    yield result
+            if time.monotonic() >= next_report:
+                self._log_summary()
+                next_report += self._report_interval
+
+    def _run_session(
+        self,
+        session: SessionState,
+        executor: Executor,
+        deadline: float,
+        results: queue.Queue,
+    ):
+        try:
+            self._run_processors(session, executor, deadline, results)
+        finally:
+            results.put(None)
+
+    def _run_processors(
+        self,
+        session: SessionState,
+        executor: Executor,
+        deadline: float,
+        results: queue.Queue,
+    ):
+        restart_delay = self._restart_delay
+        while not self._stop.is_set() and time.monotonic() < deadline:
+            processor: Optional[LiveProcessor] = None
+            failed = False
+            try:
+                processor = self._session_factory(
+                    f"{session.name}_{session.restarts}", executor
+                )
+                session.processor = processor
+                with contextlib.closing(
+                    processor.iterate_frames(deadline - time.monotonic())
+                ) as frames:
+                    for frame_name, result in frames:
+                        results.put((frame_name, result))
+                        session.frames += 1
+                        session.identified_frames += result is not None
+                        # Session is healthy again after a restart
+                        restart_delay = self._restart_delay
+                        if self._stop.is_set():
+                            break
+            except Exception:
+                logger.exception(f"Live session {session.name} failed")
+                metrics.increment("live.session_failures")
+                failed = True
+            if processor is not None:
+                self._close_processor(session, processor)
+            if not failed:
+                # Iteration ends at the deadline or on stop
+                return
+            if session.restarts >= self._max_restarts:
+                logger.error(
+                    f"Live session {session.name} is stopped after "
+                    f"{session.restarts} restarts"
+                )
+                session.failed = True
+                return
+            session.restarts += 1
+            metrics.increment("live.session_restarts")
+            self._stop.wait(min(restart_delay, max(deadline - time.monotonic(), 0)))
+            restart_delay = min(2 * restart_delay, self._max_restart_delay)
+
+    def _close_processor(self, session: SessionState, processor: LiveProcessor):
+        session.processor = None
+        session.finished_spins += processor.summary()["spins"]
+        try:
+            processor.close()
+        except Exception:
+            logger.exception(f"Failed to close live session {session.name}")
+
+
+if __name__ == "__main__":
+    import uuid
+
+    from frame_processing.result_sinks import JsonlResultSink
+    from frame_processing.symbols_identification.cached_identifier import (
+        CachedSymbolIdentifier,
+    )
+    from frame_processing.symbols_identification.symbols_identifier import (
+        CorrSymbolIdentifier,
+        SymbolsProcessor,
+    )
+    from frame_processing.symbols_identification.symbols_pack import (
+        load_symbols_pack,
+    )
+    from frame_processing.symbols_images_extraction.symbols_images_extractor import (
+        SymbolsImagesExtractor,
+    )
+    from games.slots_fortune.processing.config import SYMBOLS_DIR, GRID, SCREEN_ROI
+    from utils.state import get_debug_dir, is_debug_mode_activated, set_debug_dir
+
+    parser = argparse.ArgumentParser(description="Run concurrent live sessions")
+    parser.add_argument("--sessions", type=int, default=4)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--interval", type=float, default=60.0)
+    parser.add_argument("--report-interval", type=float, default=30.0)
+    parser.add_argument(
+        "--fake",
+        action="store_true",
+        help="Serve frames rendered from the symbols instead of Chrome sessions",
+    )
+    arguments = parser.parse_args()
+
+    if is_debug_mode_activated():
+        set_debug_dir(Path(f"./debug/{uuid.uuid4()}"))
+
+    pack = load_symbols_pack(SYMBOLS_DIR, Path("./cache/symbols_pack.npz"))
+    identifier = CachedSymbolIdentifier(
+        CorrSymbolIdentifier.from_pack(pack),
+        pack.expected_symbols(),
+        cache_path=Path("./cache/identification_cache.json"),
+    )
+    extractor = SymbolsImagesExtractor()
+    seeds = itertools.count()
+
+    def create_session(name: str, executor: Executor) -> LiveProcessor:
+        kwargs = {}
+        if arguments.fake:
+            from benchmarks.fake_driver import FakeSlotsDriver
+            from benchmarks.synthetic import SyntheticRenderer
+
+            renderer = SyntheticRenderer(
+                pack.expected_symbols(), GRID, SCREEN_ROI, noise=3.0, seed=next(seeds)
+            )
+            kwargs = dict(driver=FakeSlotsDriver(renderer), sleep=lambda _: None)
+        # Processor keeps per-session state, identifier with templates is shared
+        return LiveProcessor(
+            symbols_images_extractor=extractor,
+            symbols_processor=SymbolsProcessor(identifier),
+            grid=GRID,
+            roi=SCREEN_ROI,
+            name=name,
+            executor=executor,
+            **kwargs,
+        )
+
+    manager = SessionManager(
+        create_session,
+        sessions=arguments.sessions,
+        workers=arguments.workers,
+        report_interval=arguments.report_interval,
+    )
+    with JsonlResultSink(get_debug_dir() / "result.jsonl") as sink:
+        manager.run(arguments.interval, result_sink=sink)
+    identifier.save()
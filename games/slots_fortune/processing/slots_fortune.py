@@ -1,19 +1,23 @@
+import contextlib
 import time
 import uuid
-from io import BytesIO
+from concurrent.futures import Executor, ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional, Dict
+from typing import Optional, Dict, Iterator, List, Tuple, Callable, TYPE_CHECKING
 
 import numpy as np
-from PIL import Image
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from selenium.webdriver.remote.webelement import WebElement
-from selenium.common.exceptions import NoSuchElementException
-from skimage.io import imsave
 
 from frame_processing import process_frame
+from frame_processing.result_sinks import BaseResultSink, write_results
+from frame_processing.frames_capture.frame_sources import (
+    BaseFrameSource,
+    ClippedScreenshotFrameSource,
+)
+from games.slots_fortune.processing.config import SYMBOLS_DIR, GRID, SCREEN_ROI
+from games.slots_fortune.processing.spin_controller import SpinController
+from frame_processing.symbols_identification.cached_identifier import (
+    CachedSymbolIdentifier,
+)
 from frame_processing.symbols_identification.symbols_identifier import (
     CorrSymbolIdentifier,
     SymbolsProcessor,
@@ -21,12 +25,15 @@ from frame_processing.symbols_identification.symbols_identifier import (
 from frame_processing.symbols_images_extraction.symbols_images_extractor import (
     SymbolsImagesExtractor,
 )
-from utils.data_models import SymbolsGrid, Vector, ROI
-from utils.image_processing import crop_image
-from utils.io import read_expected_symbols
+from utils.data_models import SymbolsGrid, ROI
+from utils import metrics
 from utils.logger import logger
 from utils.state import set_debug_dir, is_debug_mode_activated, get_debug_dir
 
+if TYPE_CHECKING:
+    from selenium import webdriver
+    from selenium.webdriver.remote.webelement import WebElement
+
 
 class LiveProcessor:
     NUMBER_OF_RETRIES = 5
@@ -38,17 +45,49 @@ class LiveProcessor:
         symbols_processor: SymbolsProcessor,
         grid: SymbolsGrid,
         roi: ROI,
+        driver: Optional["webdriver.Remote"] = None,
+        frame_source: Optional[BaseFrameSource] = None,
+        spin_controller: Optional[SpinController] = None,
+        name: Optional[str] = None,
+        executor: Optional[Executor] = None,
+        sleep: Callable[[float], None] = time.sleep,
     ):
         self._symbols_images_extractor = symbols_images_extractor
         self._symbols_processor = symbols_processor
         self._grid = grid
         self._roi = roi
+        self._name = name
+        # Shared by sessions of a manager, otherwise a worker per processor
+        self._executor = executor
+        self._sleep = sleep
+
+        # Driver created here is quit when the game can not be set up
+        owns_driver = driver is None
+        if driver is None:
+            from selenium import webdriver
+            from selenium.webdriver.chrome.options import Options
+
+            chrome_options = Options()
+            chrome_options.add_argument("--start-maximized")
+            driver = webdriver.Chrome(options=chrome_options)
+
+        self._driver = driver
+        self._frame_source = frame_source or ClippedScreenshotFrameSource(
+            self._driver, roi
+        )
+        self._spin_controller = spin_controller or SpinController(self._driver)
+        self._refresh_button: Optional["WebElement"] = None
 
-        chrome_options = Options()
-        chrome_options.add_argument("--start-maximized")
+        try:
+            self._set_up_with_retries()
+        except BaseException:
+            if owns_driver:
+                self._driver.quit()
+            raise
 
-        self._driver = webdriver.Chrome(options=chrome_options)
-        self._refresh_button: Optional[WebElement] = None
+    def _set_up_with_retries(self):
+        # Selenium is imported only by the live processor itself
+        from selenium.common.exceptions import NoSuchElementException
 
         number_of_retries = 0
         while number_of_retries < self.NUMBER_OF_RETRIES:
@@ -57,18 +96,24 @@ class LiveProcessor:
                 break
             except NoSuchElementException:
                 number_of_retries += 1
+        if self._refresh_button is None:
+            raise RuntimeError(
+                f"Game is not set up after {self.NUMBER_OF_RETRIES} retries"
+            )
 
     def _set_up(self):
+        from selenium.webdriver.common.by import By
+
         self._driver.get(self.LINK)
 
         button = self._driver.find_element(By.XPATH, "//button[text()=' Демо игра']")
         button.click()
 
-        time.sleep(10)
+        self._sleep(10)
 
         frame = self._driver.find_element(By.ID, "game-iframe")
         self._driver.switch_to.frame(frame)
-        time.sleep(1)
+        self._sleep(1)
 
         self._driver.switch_to.frame(0)
 
@@ -76,88 +121,134 @@ class LiveProcessor:
             By.XPATH, "//button[@id='action-start-game']"
         )
         button.click()
-        time.sleep(1)
+        self._sleep(1)
 
         self._refresh_button = self._driver.find_element(
             By.XPATH, "//button[@id='actions-spin']"
         )
 
+    def summary(self) -> dict:
+        return self._spin_controller.summary()
+
+    def close(self):
+        self._frame_source.close()
+        self._driver.quit()
+
+    def _frame_name(self, index: int) -> str:
+        if self._name is None:
+            return f"frame_{index}"
+        return f"{self._name}/frame_{index}"
+
     def _is_frame_valid(self):
-        frame_is_valid = True
-        try:
-            self._driver.find_element(By.CLASS_NAME, "spin__button--stop")
-            frame_is_valid = False
-        except NoSuchElementException:
-            pass
-        logger.debug(f"Frame is valid: {frame_is_valid}")
+        frame_is_valid = not self._spin_controller.is_spinning()
+        logger.debug("Frame is valid: %s", frame_is_valid)
         return frame_is_valid
 
-    def process_frames(self, interval: int) -> Dict[str, Optional[dict]]:
-        if is_debug_mode_activated():
-            execution_id = str(uuid.uuid4())
-            set_debug_dir(Path(f"./debug/{execution_id}"))
+    def process_frames(
+        self, interval: int, result_sink: Optional[BaseResultSink] = None
+    ) -> Optional[Dict[str, Optional[List[dict]]]]:
+        return write_results(self.iterate_frames(interval), result_sink)
 
+    def iterate_frames(
+        self, interval: int
+    ) -> Iterator[Tuple[str, Optional[List[dict]]]]:
         s = time.time()
 
-        result = {}
         frames = 0
-        while time.time() - s < interval:
-            detected = False
-            not_detected = 0
-            while not detected:
-                frame_name = f"frame_{frames}"
-                if not_detected > 3:
-                    break
-                if not self._is_frame_valid():
-                    continue
-
-                loading_start = time.time()
-                im_bytes = BytesIO(self._driver.get_screenshot_as_png())
-                frame_image = Image.open(im_bytes)
-                frame_image = np.array(frame_image)
-                logger.debug(f"Time of loading image: {time.time() - loading_start}")
-
-                frame_image = crop_image(frame_image, self._roi)
-
-                result_per_frame = process_frame(
-                    frame_image=frame_image,
-                    frame_name=frame_name,
-                    symbols_extractor=self._symbols_images_extractor,
-                    reels_processor=self._symbols_processor,
-                    grid=self._grid,
-                )
-                if result_per_frame is None:
-                    not_detected += 1
-                else:
-                    detected = True
-                result[frame_name] = result_per_frame
-
-                if is_debug_mode_activated():
-                    imsave(get_debug_dir() / f"{frame_name}.png", frame_image)
-
-                frames += 1
-            self._refresh_button.click()
-        return result
+        # Driver is used only from this thread, identification runs on a worker.
+        # After a miss the retry frame is captured while the frame is identified
+        with (
+            contextlib.nullcontext(self._executor)
+            if self._executor is not None
+            else ThreadPoolExecutor(max_workers=1)
+        ) as executor:
+            while time.time() - s < interval:
+                detected = False
+                not_detected = 0
+                next_frame_image: Optional[np.ndarray] = None
+                while not detected:
+                    frame_name = self._frame_name(frames)
+                    if not_detected > 3:
+                        break
+                    if next_frame_image is None:
+                        if not self._spin_controller.wait_until_stopped():
+                            not_detected += 1
+                            continue
+                        with metrics.timer("live.capture"):
+                            frame_image = self._frame_source.get_frame()
+                    else:
+                        frame_image = next_frame_image
+
+                    processing = executor.submit(
+                        process_frame,
+                        frame_image=frame_image,
+                        frame_name=frame_name,
+                        symbols_extractor=self._symbols_images_extractor,
+                        reels_processor=self._symbols_processor,
+                        grid=self._grid,
+                        save_frame_image=True,
+                    )
+                    # Frame for the retry, used only if this one is not identified.
+                    # Most frames are identified at once, so it is prefetched only
+                    # for spins that already had a miss
+                    next_frame_image = None
+                    if not_detected > 0 and self._is_frame_valid():
+                        with metrics.timer("live.capture"):
+                            next_frame_image = self._frame_source.get_frame()
+                    result_per_frame = processing.result()
+
+                    if result_per_frame is None:
+                        not_detected += 1
+                    else:
+                        detected = True
+                        self._spin_controller.mark_identified()
+                    yield frame_name, result_per_frame
+
+                    frames += 1
+                self._spin_controller.spin(self._refresh_button)
+
+        summary = self._spin_controller.summary()
+        logger.info(
+            f"Spins per minute: {summary['spins'] / (time.time() - s) * 60:.1f}, "
+            f"mean spin time: {summary['mean_spin_duration']}, "
+            f"mean identification time: {summary['mean_identification_duration']}, "
+            f"driver polls: {summary['polls']}"
+        )
 
 
 if __name__ == "__main__":
-    import json
+    from frame_processing.result_sinks import JsonlResultSink
+    from frame_processing.symbols_identification.symbols_pack import (
+        load_symbols_pack,
+    )
 
     ex = SymbolsImagesExtractor()
-    identifier = CorrSymbolIdentifier(read_expected_symbols(Path(r"../symbols")))
-    processor = SymbolsProcessor(identifier)
-    grid = SymbolsGrid(
-        start_point=Vector(x=45, y=85),
-        symbol_size=Vector(x=185, y=140),
-        offset=Vector(x=0, y=20),
-        number_of_elements=Vector(x=5, y=3),
+    pack = load_symbols_pack(SYMBOLS_DIR, Path("./cache/symbols_pack.npz"))
+    identifier = CachedSymbolIdentifier(
+        CorrSymbolIdentifier.from_pack(pack),
+        pack.expected_symbols(),
+        cache_path=Path("./cache/identification_cache.json"),
     )
-    roi = ROI(450, 1500, 129, 729)
+    processor = SymbolsProcessor(identifier)
+
+    # Set up before processing, so that results can be streamed into it
+    if is_debug_mode_activated():
+        set_debug_dir(Path(f"./debug/{uuid.uuid4()}"))
 
     e = LiveProcessor(
-        symbols_images_extractor=ex, symbols_processor=processor, roi=roi, grid=grid
+        symbols_images_extractor=ex,
+        symbols_processor=processor,
+        roi=SCREEN_ROI,
+        grid=GRID,
     )
-    r = e.process_frames(60)
-
-    with open(get_debug_dir() / "result.json", "w") as f:
-        json.dump(r, f)
+    exporter = None
+    if metrics.is_metrics_enabled():
+        exporter = metrics.PeriodicExporter(
+            get_debug_dir() / "metrics.prom", metrics_format="prometheus"
+        ).start()
+    with JsonlResultSink(get_debug_dir() / "result.jsonl") as sink:
+        e.process_frames(60, result_sink=sink)
+    identifier.save()
+    e.close()
+    if exporter is not None:
+        exporter.stop()
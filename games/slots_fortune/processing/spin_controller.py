@@ -0,0 +1,168 @@
+import time
+from typing import Optional, Callable, TYPE_CHECKING
+
+from utils import metrics
+from utils.logger import logger
+
+if TYPE_CHECKING:
+    from selenium.webdriver.remote.webelement import WebElement
+
+# Resolves as soon as no element with the class is left in the document
+_WAIT_FOR_REMOVAL_SCRIPT = """
+const [className, timeout, done] = arguments;
+if (document.getElementsByClassName(className).length === 0) {
+    done(true);
+    return;
+}
+const observer = new MutationObserver(() => {
+    if (document.getElementsByClassName(className).length === 0) {
+        observer.disconnect();
+        clearTimeout(timer);
+        done(true);
+    }
+});
+const timer = setTimeout(() => {
+    observer.disconnect();
+    done(false);
+}, timeout);
+observer.observe(document, {
+    subtree: true, childList: true, attributes: true, attributeFilter: ["class"]
+});
+"""
+
+
+class SpinTimings:
+    def __init__(self, clicked_at: Optional[float]):
+        self.clicked_at = clicked_at
+        self.stopped_at: Optional[float] = None
+        self.identified_at: Optional[float] = None
+
+    @property
+    def spin_duration(self) -> Optional[float]:
+        if self.clicked_at is None or self.stopped_at is None:
+            return None
+        return self.stopped_at - self.clicked_at
+
+    @property
+    def identification_duration(self) -> Optional[float]:
+        if self.stopped_at is None or self.identified_at is None:
+            return None
+        return self.identified_at - self.stopped_at
+
+
+class SpinController:
+    STOP_BUTTON_CLASS = "spin__button--stop"
+
+    def __init__(
+        self,
+        driver,
+        timeout: float = 30.0,
+        initial_poll_interval: float = 0.05,
+        max_poll_interval: float = 0.5,
+        backoff: float = 1.5,
+        event_driven: bool = False,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self._driver = driver
+        self._timeout = timeout
+        self._initial_poll_interval = initial_poll_interval
+        self._max_poll_interval = max_poll_interval
+        self._backoff = backoff
+        self._event_driven = event_driven
+        self._clock = clock
+        self._sleep = sleep
+        self._current: Optional[SpinTimings] = None
+        # Running totals, so that long sessions do not keep the timings of every spin
+        self.spins = 0
+        self.polls = 0
+        self._spin_duration_sum = 0.0
+        self._spin_durations = 0
+        self._identification_duration_sum = 0.0
+        self._identification_durations = 0
+
+    @property
+    def current(self) -> Optional[SpinTimings]:
+        return self._current
+
+    def is_spinning(self) -> bool:
+        from selenium.webdriver.common.by import By
+
+        self.polls += 1
+        metrics.increment("live.driver_polls")
+        return bool(self._driver.find_elements(By.CLASS_NAME, self.STOP_BUTTON_CLASS))
+
+    def spin(self, button: "WebElement"):
+        self._current = SpinTimings(clicked_at=self._clock())
+        self.spins += 1
+        metrics.increment("live.spins")
+        button.click()
+
+    def _poll_until_stopped(self, deadline: float) -> bool:
+        interval = self._initial_poll_interval
+        while self.is_spinning():
+            remaining = deadline - self._clock()
+            if remaining <= 0:
+                return False
+            self._sleep(min(interval, remaining))
+            interval = min(interval * self._backoff, self._max_poll_interval)
+        return True
+
+    def _wait_for_removal(self, deadline: float) -> bool:
+        self.polls += 1
+        timeout_ms = max(int((deadline - self._clock()) * 1000), 0)
+        self._driver.set_script_timeout(timeout_ms / 1000 + 5)
+        return bool(
+            self._driver.execute_async_script(
+                _WAIT_FOR_REMOVAL_SCRIPT, self.STOP_BUTTON_CLASS, timeout_ms
+            )
+        )
+
+    def wait_until_stopped(self) -> bool:
+        if self._current is None:
+            # Reels spinning before the first click are not counted as a spin
+            self._current = SpinTimings(clicked_at=None)
+
+        deadline = self._clock() + self._timeout
+        if self._event_driven:
+            stopped = self._wait_for_removal(deadline)
+        else:
+            stopped = self._poll_until_stopped(deadline)
+
+        if stopped:
+            if self._current.stopped_at is None:
+                self._current.stopped_at = self._clock()
+                spin_duration = self._current.spin_duration
+                if spin_duration is not None:
+                    self._spin_duration_sum += spin_duration
+                    self._spin_durations += 1
+                    metrics.observe("live.spin", spin_duration)
+        else:
+            metrics.increment("live.spin_timeouts")
+            logger.warning(f"Reels did not stop in {self._timeout} s")
+        return stopped
+
+    def mark_identified(self):
+        if self._current is not None and self._current.identified_at is None:
+            self._current.identified_at = self._clock()
+            identification_duration = self._current.identification_duration
+            if identification_duration is not None:
+                self._identification_duration_sum += identification_duration
+                self._identification_durations += 1
+                metrics.observe("live.stop_to_identified", identification_duration)
+
+    def summary(self) -> dict:
+        return dict(
+            spins=self.spins,
+            polls=self.polls,
+            mean_spin_duration=(
+                self._spin_duration_sum / self._spin_durations
+                if self._spin_durations
+                else None
+            ),
+            mean_identification_duration=(
+                self._identification_duration_sum / self._identification_durations
+                if self._identification_durations
+                else None
+            ),
+        )
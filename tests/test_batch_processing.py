@@ -0,0 +1,124 @@
+import json
+
+import pytest
+
+from benchmarks.synthetic import SyntheticRenderer
+from frame_processing.batch_processing import (
+    CHECKPOINT_FILENAME,
+    process_videos,
+    result_path,
+)
+from frame_processing.frames_extraction.frame_extractor import FramesExtractor
+from frame_processing.symbols_identification.cached_identifier import (
+    CachedSymbolIdentifier,
+)
+from frame_processing.symbols_identification.symbols_identifier import (
+    CorrSymbolIdentifier,
+    SymbolsProcessor,
+)
+from frame_processing.symbols_images_extraction.symbols_images_extractor import (
+    SymbolsImagesExtractor,
+)
+from games.slots_fortune.processing.config import SYMBOLS_DIR, GRID, SCREEN_ROI
+from utils import metrics, state
+from utils.io import read_expected_symbols
+
+
+@pytest.fixture(autouse=True)
+def enabled_metrics(monkeypatch):
+    monkeypatch.setitem(state.state, "debug", False)
+    monkeypatch.setattr(metrics, "_enabled", True)
+    monkeypatch.setattr(metrics, "registry", metrics.MetricsRegistry())
+
+
+@pytest.fixture(scope="module")
+def expected_symbols():
+    return read_expected_symbols(SYMBOLS_DIR)
+
+
+@pytest.fixture(scope="module")
+def videos(tmp_path_factory, expected_symbols):
+    video_dir = tmp_path_factory.mktemp("videos")
+    videos = []
+    for seed in range(2):
+        video_path = video_dir / f"video_{seed}.avi"
+        SyntheticRenderer(expected_symbols, GRID, SCREEN_ROI, seed=seed).render_video(
+            video_path, spins=2, still_frames=25, transition_frames=10
+        )
+        videos.append(video_path)
+    return videos
+
+
+def _process(videos, output_dir, identifier) -> dict:
+    return process_videos(
+        videos=videos,
+        output_dir=output_dir,
+        frame_extractor=FramesExtractor(),
+        roi=SCREEN_ROI,
+        grid=GRID,
+        symbols_extractor=SymbolsImagesExtractor(),
+        reels_processor=SymbolsProcessor(identifier),
+        workers=2,
+    )
+
+
+def test_videos_are_processed_in_workers_and_resumed(
+    tmp_path, expected_symbols, videos
+):
+    output_dir = tmp_path / "output"
+
+    report = _process(videos, output_dir, CorrSymbolIdentifier(expected_symbols))
+
+    assert report["videos"] == 2
+    assert report["failed"] == 0
+    results = [
+        json.loads(result_path(output_dir, video).read_text()) for video in videos
+    ]
+    assert [len(result) for result in results] == [2, 2]
+    assert all(
+        frame_result is not None
+        for result in results
+        for frame_result in result.values()
+    )
+    # Frames are counted by the workers
+    assert metrics.snapshot()["counters"]["frames"] == report["frames"] == 4
+
+    report = _process(videos, output_dir, CorrSymbolIdentifier(expected_symbols))
+
+    assert report["videos"] == 0
+    checkpoint = (output_dir / CHECKPOINT_FILENAME).read_text().splitlines()
+    assert len(checkpoint) == 2
+
+
+def test_identifications_of_workers_are_merged_and_reused(
+    tmp_path, expected_symbols, videos
+):
+    cache_path = tmp_path / "identification_cache.json"
+
+    def cached():
+        return CachedSymbolIdentifier(
+            CorrSymbolIdentifier(expected_symbols),
+            expected_symbols,
+            cache_path=cache_path,
+        )
+
+    identifier = cached()
+    _process(videos, tmp_path / "first", identifier)
+    identifier.save()
+
+    assert len(identifier) > 0
+    # Workers may both identify an image before either result is merged
+    assert metrics.snapshot()["counters"]["identification_cache.misses"] >= len(
+        identifier
+    )
+
+    metrics.registry.reset()
+    identifier = cached()
+    report = _process(videos, tmp_path / "second", identifier)
+
+    assert report["videos"] == 2
+    counters = metrics.snapshot()["counters"]
+    assert counters["identification_cache.hits"] == report["frames"] * (
+        GRID.number_of_elements.x * GRID.number_of_elements.y
+    )
+    assert counters.get("identification_cache.misses", 0) == 0
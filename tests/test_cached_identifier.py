@@ -0,0 +1,74 @@
+import pickle
+
+import pytest
+
+from frame_processing.symbols_identification.cached_identifier import (
+    CachedSymbolIdentifier,
+)
+from frame_processing.symbols_identification.symbols_identifier import (
+    CorrSymbolIdentifier,
+)
+from games.slots_fortune.processing.config import SYMBOLS_DIR
+from utils.data_models import CroppedSymbol, Vector
+from utils.io import read_expected_symbols
+
+
+@pytest.fixture(scope="module")
+def expected_symbols():
+    return read_expected_symbols(SYMBOLS_DIR)
+
+
+def _cached(expected_symbols, cache_path, quantization_shift=2, **kwargs):
+    return CachedSymbolIdentifier(
+        CorrSymbolIdentifier(expected_symbols, **kwargs),
+        expected_symbols,
+        quantization_shift=quantization_shift,
+        cache_path=cache_path,
+    )
+
+
+@pytest.mark.parametrize(
+    "settings",
+    [
+        dict(windows_step=2),
+        dict(search_mode="exhaustive"),
+        dict(windows_part=0.2),
+        dict(quantization_shift=3),
+    ],
+)
+def test_persisted_cache_is_discarded_when_settings_change(
+    tmp_path, expected_symbols, settings
+):
+    cache_path = tmp_path / "cache.json"
+    identifier = _cached(expected_symbols, cache_path)
+    symbols = [
+        CroppedSymbol(frame="frame_0", index=Vector(x=0, y=index), image=s.image)
+        for index, s in enumerate(expected_symbols[:3])
+    ]
+    identified = identifier.identify_symbols(symbols)
+    identifier.save()
+
+    reloaded = _cached(expected_symbols, cache_path)
+    assert len(reloaded) == len(symbols)
+    assert [s.name for s in reloaded.identify_symbols(symbols)] == [
+        s.name for s in identified
+    ]
+    assert reloaded.hits == len(symbols)
+
+    assert len(_cached(expected_symbols, cache_path, **settings)) == 0
+
+
+def test_cached_identifier_is_picklable_with_its_entries(expected_symbols):
+    identifier = _cached(expected_symbols, None)
+    symbols = [
+        CroppedSymbol(frame="frame_0", index=Vector(x=0, y=0), image=s.image)
+        for s in expected_symbols[:2]
+    ]
+    identifier.identify_symbols(symbols)
+
+    restored = pickle.loads(pickle.dumps(identifier))
+    assert len(restored) == len(identifier)
+    assert [s.name for s in restored.identify_symbols(symbols)] == [
+        s.name for s in expected_symbols[:2]
+    ]
+    assert restored.hits == identifier.hits + len(symbols)
@@ -0,0 +1,119 @@
+from pathlib import Path
+from typing import Iterator, List
+
+import numpy as np
+import pytest
+
+from benchmarks.synthetic import SyntheticRenderer
+from frame_processing.frames_extraction.frame_extractor import FramesExtractor
+from games.slots_fortune.processing.config import SYMBOLS_DIR, GRID, SCREEN_ROI
+from utils.data_models import ROI
+from utils.io import read_expected_symbols
+
+
+class _PreloadedFramesExtractor(FramesExtractor):
+    # Serves already decoded frames, so that emitted frames can be matched to
+    # their sampled indices by identity
+    def __init__(self, frames: List[np.ndarray], **kwargs):
+        super().__init__(decode_in_background=False, **kwargs)
+        self._frames = frames
+
+    def _read_sampled_frames(self, video_path: Path, roi: ROI) -> Iterator[np.ndarray]:
+        return iter(self._frames)
+
+
+def _corrcoef_stable_indices(
+    frames: List[np.ndarray], similar_frames_needed: int = 3
+) -> List[int]:
+    # Stable frames as emitted before signatures, by np.corrcoef of full frames
+    stable = []
+    similar_frames = 0
+    for index in range(1, len(frames)):
+        correlation = np.corrcoef(frames[index].ravel(), frames[index - 1].ravel())[
+            0, 1
+        ]
+        if not correlation > FramesExtractor.CORR_THRESH:
+            if similar_frames > similar_frames_needed:
+                stable.append(index - 1)
+            similar_frames = 0
+        else:
+            similar_frames += 1
+    return stable
+
+
+def _emitted_indices(frames: List[np.ndarray], similarity_mode: str) -> List[int]:
+    extractor = _PreloadedFramesExtractor(frames, similarity_mode=similarity_mode)
+    positions = {id(frame): index for index, frame in enumerate(frames)}
+    return [positions[id(frame)] for frame in extractor.extract_frames(Path(), ROI)]
+
+
+@pytest.fixture(scope="module")
+def expected_symbols():
+    return read_expected_symbols(SYMBOLS_DIR)
+
+
+@pytest.mark.parametrize("noise, blur, seed", [(0.0, 0, 0), (5.0, 0, 1), (10.0, 2, 2)])
+def test_similarity_modes_emit_baseline_stable_frames(
+    tmp_path, expected_symbols, noise, blur, seed
+):
+    video_path = tmp_path / "synthetic.avi"
+    spins = SyntheticRenderer(
+        expected_symbols, GRID, SCREEN_ROI, noise=noise, blur=blur, seed=seed
+    ).render_video(video_path, spins=3, still_frames=25, transition_frames=10)
+    frames = [
+        frame.copy()
+        for frame in FramesExtractor()._read_sampled_frames(video_path, SCREEN_ROI)
+    ]
+
+    expected = _corrcoef_stable_indices(frames)
+    # Last spin is followed by a transition, so every spin has a stable frame.
+    # All reels move between stills, thumbnails are not equivalent when only
+    # some of them do
+    assert len(expected) == len(spins)
+    assert _emitted_indices(frames, "full") == expected
+    assert _emitted_indices(frames, "thumbnail") == expected
+
+
+def test_default_mode_matches_corrcoef_when_some_reels_move(expected_symbols):
+    renderer = SyntheticRenderer(expected_symbols, GRID, SCREEN_ROI, noise=3.0)
+    rng = np.random.default_rng(0)
+    extractor = FramesExtractor()
+    reels = GRID.number_of_elements.x
+    for _ in range(40):
+        symbol_ids = renderer.random_symbols()
+        # Reels still stopping are shifted, the others show the same symbols
+        reel_shifts = np.zeros(reels, int)
+        moving = rng.choice(reels, rng.integers(1, 4), replace=False)
+        reel_shifts[moving] = rng.integers(1, GRID.symbol_size.y, len(moving))
+        frame_1 = renderer.render_roi(symbol_ids)
+        frame_2 = renderer.render_roi(symbol_ids, reel_shifts)
+
+        expected = (
+            np.corrcoef(frame_1.ravel(), frame_2.ravel())[0, 1]
+            > FramesExtractor.CORR_THRESH
+        )
+        assert (
+            extractor._is_signatures_similar(
+                extractor._signature(frame_1), extractor._signature(frame_2)
+            )
+            == expected
+        )
+
+
+def test_seeking_samples_the_same_frames_as_grabbing(tmp_path, expected_symbols):
+    video_path = tmp_path / "synthetic.avi"
+    SyntheticRenderer(expected_symbols, GRID, SCREEN_ROI, noise=3.0).render_video(
+        video_path, spins=3, still_frames=25, transition_frames=10
+    )
+
+    def sampled(seek_min_skip: int) -> List[np.ndarray]:
+        extractor = FramesExtractor(skip_frames=10, seek_min_skip=seek_min_skip)
+        return [
+            frame.copy()
+            for frame in extractor._read_sampled_frames(video_path, SCREEN_ROI)
+        ]
+
+    grabbed = sampled(seek_min_skip=11)
+    seeked = sampled(seek_min_skip=10)
+    assert len(grabbed) == len(seeked) == 11
+    assert all(np.array_equal(a, b) for a, b in zip(grabbed, seeked))
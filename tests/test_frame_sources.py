@@ -0,0 +1,149 @@
+import base64
+import time
+from typing import List, Optional, Tuple
+
+import cv2
+import numpy as np
+import pytest
+
+from benchmarks.fake_driver import FakeSlotsDriver
+from benchmarks.synthetic import SyntheticRenderer
+from frame_processing.frames_capture.frame_sources import (
+    ClippedScreenshotFrameSource,
+    FakeFrameSource,
+)
+from frame_processing.symbols_images_extraction.symbols_images_extractor import (
+    SymbolsImagesExtractor,
+)
+from games.slots_fortune.processing.config import SYMBOLS_DIR, GRID, SCREEN_ROI
+from games.slots_fortune.processing.slots_fortune import LiveProcessor
+from utils import state
+from utils.data_models import ROI, CroppedSymbol, Reel
+from utils.io import read_expected_symbols
+
+
+@pytest.fixture(autouse=True)
+def no_debug(monkeypatch):
+    monkeypatch.setitem(state.state, "debug", False)
+
+
+class _ScreenshotDriver:
+    # Renders clips at the actual device pixel ratio, reports the given ones
+    def __init__(self, reported_ratios: List[float], actual_ratio: float = 1.0):
+        self._reported_ratios = reported_ratios
+        self._actual_ratio = actual_ratio
+        self.captures = 0
+
+    def execute_script(self, script: str) -> float:
+        return self._reported_ratios.pop(0)
+
+    def execute_cdp_cmd(self, cmd: str, params: dict) -> dict:
+        self.captures += 1
+        clip = params["clip"]
+        image = np.zeros(
+            (
+                int(clip["height"] * self._actual_ratio),
+                int(clip["width"] * self._actual_ratio),
+                3,
+            ),
+            np.uint8,
+        )
+        _, png = cv2.imencode(".png", image)
+        return dict(data=base64.b64encode(png.tobytes()).decode())
+
+
+def test_clipped_source_refreshes_stale_device_pixel_ratio():
+    roi = ROI(100, 300, 50, 150)
+    driver = _ScreenshotDriver(reported_ratios=[2.0, 1.0])
+    frame = ClippedScreenshotFrameSource(driver, roi).get_frame()
+    assert frame.shape[:2] == (100, 200)
+    assert driver.captures == 2
+
+
+def test_clipped_source_rejects_undersized_clip():
+    roi = ROI(100, 300, 50, 150)
+    driver = _ScreenshotDriver(reported_ratios=[2.0, 2.0])
+    with pytest.raises(ValueError, match="ROI size"):
+        ClippedScreenshotFrameSource(driver, roi).get_frame()
+
+
+class _RecordingFrameSource(FakeFrameSource):
+    def __init__(self, frames: List[np.ndarray], capture_delay: float):
+        super().__init__(frames, capture_delay)
+        self.intervals: List[Tuple[float, float]] = []
+
+    def get_frame(self) -> np.ndarray:
+        started_at = time.monotonic()
+        frame = super().get_frame()
+        self.intervals.append((started_at, time.monotonic()))
+        return frame
+
+
+class _SlowProcessor:
+    # Identifies every identified_every-th frame, misses the others
+    def __init__(self, duration: float, identified_every: int):
+        self._duration = duration
+        self._identified_every = identified_every
+        self.intervals: List[Tuple[float, float]] = []
+
+    def process_frames_symbols(
+        self, symbols: List[CroppedSymbol]
+    ) -> Optional[List[Reel]]:
+        started_at = time.monotonic()
+        time.sleep(self._duration)
+        self.intervals.append((started_at, time.monotonic()))
+        if len(self.intervals) % self._identified_every:
+            return None
+        return [Reel.create_empty(frame=symbols[0].frame, index=0)]
+
+
+def _live_processor(
+    frame_source: FakeFrameSource, processor: _SlowProcessor
+) -> LiveProcessor:
+    expected_symbols = read_expected_symbols(SYMBOLS_DIR)
+    renderer = SyntheticRenderer(expected_symbols, GRID, SCREEN_ROI)
+    return LiveProcessor(
+        symbols_images_extractor=SymbolsImagesExtractor(),
+        symbols_processor=processor,
+        grid=GRID,
+        roi=SCREEN_ROI,
+        driver=FakeSlotsDriver(renderer, spin_duration=0.05),
+        frame_source=frame_source,
+        sleep=lambda _: None,
+    )
+
+
+@pytest.fixture(scope="module")
+def frames() -> List[np.ndarray]:
+    expected_symbols = read_expected_symbols(SYMBOLS_DIR)
+    renderer = SyntheticRenderer(expected_symbols, GRID, SCREEN_ROI)
+    return [renderer.render_roi(renderer.random_symbols()) for _ in range(3)]
+
+
+def test_identified_frames_are_captured_once(frames):
+    frame_source = _RecordingFrameSource(frames, capture_delay=0.01)
+    processor = _SlowProcessor(duration=0.05, identified_every=1)
+
+    results = list(_live_processor(frame_source, processor).iterate_frames(0.5))
+
+    assert len(results) == len(processor.intervals) > 1
+    assert frame_source.captured == len(results)
+
+
+def test_retry_frame_capture_overlaps_identification_after_miss(frames):
+    frame_source = _RecordingFrameSource(frames, capture_delay=0.05)
+    processor = _SlowProcessor(duration=0.2, identified_every=3)
+
+    results = list(_live_processor(frame_source, processor).iterate_frames(1.5))
+
+    assert len(results) == len(processor.intervals) >= 3
+    overlapped = [
+        any(
+            capture_start < identification_end and identification_start < capture_end
+            for capture_start, capture_end in frame_source.intervals
+        )
+        for identification_start, identification_end in processor.intervals
+    ]
+    # First frame of a spin is captured before it is identified, retries are
+    # captured while the previous frame is identified
+    assert overlapped == [index % 3 != 0 for index in range(len(processor.intervals))]
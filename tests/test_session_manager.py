@@ -0,0 +1,168 @@
+import contextlib
+import itertools
+import logging
+import threading
+import time
+from concurrent.futures import Executor
+from typing import Dict
+
+import pytest
+from selenium.common.exceptions import NoSuchElementException
+
+from benchmarks.fake_driver import FakeSlotsDriver
+from benchmarks.synthetic import SyntheticRenderer
+from frame_processing.symbols_identification.symbols_identifier import (
+    CorrSymbolIdentifier,
+    SymbolsProcessor,
+)
+from frame_processing.symbols_images_extraction.symbols_images_extractor import (
+    SymbolsImagesExtractor,
+)
+from games.slots_fortune.processing.config import SYMBOLS_DIR, GRID, SCREEN_ROI
+from games.slots_fortune.processing.session_manager import SessionManager
+from games.slots_fortune.processing.slots_fortune import LiveProcessor
+from utils import state
+from utils.io import read_expected_symbols
+
+
+@pytest.fixture(autouse=True)
+def no_debug(monkeypatch):
+    monkeypatch.setitem(state.state, "debug", False)
+
+
+def test_killed_session_is_restarted_and_spins_are_reported(caplog):
+    expected_symbols = read_expected_symbols(SYMBOLS_DIR)
+    identifier = CorrSymbolIdentifier(expected_symbols)
+    extractor = SymbolsImagesExtractor()
+    seeds = itertools.count()
+    drivers: Dict[str, FakeSlotsDriver] = {}
+    started = threading.Event()
+
+    def create_session(name: str, executor: Executor) -> LiveProcessor:
+        renderer = SyntheticRenderer(
+            expected_symbols, GRID, SCREEN_ROI, noise=3.0, seed=next(seeds)
+        )
+        drivers[name] = FakeSlotsDriver(renderer, spin_duration=0.2)
+        if name == "session_1_0":
+            started.set()
+        return LiveProcessor(
+            symbols_images_extractor=extractor,
+            symbols_processor=SymbolsProcessor(identifier),
+            grid=GRID,
+            roi=SCREEN_ROI,
+            driver=drivers[name],
+            name=name,
+            executor=executor,
+            sleep=lambda _: None,
+        )
+
+    def kill_session():
+        started.wait()
+        time.sleep(1.0)
+        drivers["session_1_0"].kill()
+
+    killer = threading.Thread(target=kill_session, daemon=True)
+    killer.start()
+    manager = SessionManager(
+        create_session,
+        sessions=3,
+        workers=2,
+        restart_delay=0.1,
+        report_interval=1.0,
+    )
+    with caplog.at_level(logging.INFO, logger="slots_parser"):
+        results = manager.run(6.0)
+    killer.join()
+
+    summary = manager.summary()
+    assert summary["restarts"] == 1
+    assert summary["failed_sessions"] == 0
+    assert "session_1_1" in drivers
+    assert all(driver.closed for driver in drivers.values())
+    assert summary["spins"] > 0
+    assert summary["spins_per_minute"] > 0
+    assert any(
+        record.getMessage().startswith("Spins per minute")
+        and "restarts" in record.getMessage()
+        for record in caplog.records
+    )
+    # Frames of the restarted session are written under its new name
+    assert any(frame.startswith("session_1_1/") for frame in results)
+    assert summary["frames"] == len(results)
+
+
+def test_closing_results_iterator_stops_sessions():
+    expected_symbols = read_expected_symbols(SYMBOLS_DIR)
+    identifier = CorrSymbolIdentifier(expected_symbols)
+    drivers = []
+
+    def create_session(name: str, executor: Executor) -> LiveProcessor:
+        renderer = SyntheticRenderer(expected_symbols, GRID, SCREEN_ROI)
+        drivers.append(FakeSlotsDriver(renderer, spin_duration=0.05))
+        return LiveProcessor(
+            symbols_images_extractor=SymbolsImagesExtractor(),
+            symbols_processor=SymbolsProcessor(identifier),
+            grid=GRID,
+            roi=SCREEN_ROI,
+            driver=drivers[-1],
+            name=name,
+            executor=executor,
+            sleep=lambda _: None,
+        )
+
+    manager = SessionManager(create_session, sessions=2, workers=1)
+    s = time.monotonic()
+    with contextlib.closing(manager.iterate_results(60.0)) as iterator:
+        results = list(itertools.islice(iterator, 3))
+
+    assert len(results) == 3
+    assert time.monotonic() - s < 30.0
+    assert len(drivers) == 2
+    assert all(driver.closed for driver in drivers)
+
+
+class _BrokenGameDriver:
+    def __init__(self, error: Exception):
+        self._error = error
+        self.quits = 0
+
+    def get(self, url: str):
+        pass
+
+    def find_element(self, by: str, value: str):
+        raise self._error
+
+    def quit(self):
+        self.quits += 1
+
+
+def _create_live_processor(driver=None) -> LiveProcessor:
+    return LiveProcessor(
+        symbols_images_extractor=SymbolsImagesExtractor(),
+        symbols_processor=None,
+        grid=GRID,
+        roi=SCREEN_ROI,
+        driver=driver,
+        sleep=lambda _: None,
+    )
+
+
+@pytest.mark.parametrize(
+    "error, expected_error",
+    [(NoSuchElementException(), RuntimeError), (ValueError("Broken"), ValueError)],
+)
+def test_created_driver_is_quit_when_game_is_not_set_up(
+    monkeypatch, error, expected_error
+):
+    driver = _BrokenGameDriver(error)
+    monkeypatch.setattr("selenium.webdriver.Chrome", lambda options: driver)
+    with pytest.raises(expected_error):
+        _create_live_processor()
+    assert driver.quits == 1
+
+
+def test_given_driver_is_not_quit_when_game_is_not_set_up():
+    driver = _BrokenGameDriver(NoSuchElementException())
+    with pytest.raises(RuntimeError):
+        _create_live_processor(driver)
+    assert driver.quits == 0
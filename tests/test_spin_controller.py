@@ -0,0 +1,118 @@
+from typing import List
+
+import pytest
+
+from games.slots_fortune.processing.spin_controller import SpinController
+
+
+class _FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps: List[float] = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class _StopButtonDriver:
+    # Stop button is present for the first spinning_polls lookups
+    def __init__(self, spinning_polls: int):
+        self._spinning_polls = spinning_polls
+        self.polls = 0
+
+    def find_elements(self, by: str, value: str) -> list:
+        self.polls += 1
+        return [object()] if self.polls <= self._spinning_polls else []
+
+
+class _Button:
+    def __init__(self):
+        self.clicks = 0
+
+    def click(self):
+        self.clicks += 1
+
+
+def _controller(driver, clock: _FakeClock, timeout: float = 30.0) -> SpinController:
+    return SpinController(
+        driver,
+        timeout=timeout,
+        initial_poll_interval=0.05,
+        max_poll_interval=0.5,
+        backoff=1.5,
+        clock=clock,
+        sleep=clock.sleep,
+    )
+
+
+def test_polls_with_backoff_until_stop_button_disappears():
+    clock = _FakeClock()
+    driver = _StopButtonDriver(spinning_polls=8)
+    controller = _controller(driver, clock)
+
+    assert controller.wait_until_stopped()
+    assert driver.polls == controller.polls == 9
+    assert clock.sleeps == pytest.approx(
+        [0.05, 0.075, 0.1125, 0.16875, 0.253125, 0.3796875, 0.5, 0.5]
+    )
+
+
+def test_returns_false_on_timeout():
+    clock = _FakeClock()
+    driver = _StopButtonDriver(spinning_polls=10**6)
+    controller = _controller(driver, clock, timeout=2.0)
+
+    assert not controller.wait_until_stopped()
+    assert clock.now == pytest.approx(2.0)
+    assert clock.sleeps[-1] <= 0.5
+    assert controller.current.stopped_at is None
+    assert controller.current.spin_duration is None
+    assert controller.summary()["spins"] == 0
+
+
+def test_records_click_to_stop_and_stop_to_identified_timings():
+    clock = _FakeClock()
+    driver = _StopButtonDriver(spinning_polls=3)
+    controller = _controller(driver, clock)
+    button = _Button()
+
+    clock.now = 10.0
+    controller.spin(button)
+    assert button.clicks == 1
+    assert controller.wait_until_stopped()
+    clock.now += 0.3
+    controller.mark_identified()
+
+    timings = controller.current
+    assert timings.clicked_at == 10.0
+    assert timings.spin_duration == pytest.approx(0.05 + 0.075 + 0.1125)
+    assert timings.identification_duration == pytest.approx(0.3)
+    summary = controller.summary()
+    assert summary["spins"] == 1
+    assert summary["polls"] == 4
+    assert summary["mean_spin_duration"] == pytest.approx(timings.spin_duration)
+    assert summary["mean_identification_duration"] == pytest.approx(0.3)
+
+
+def test_counts_only_clicked_spins():
+    clock = _FakeClock()
+    driver = _StopButtonDriver(spinning_polls=0)
+    controller = _controller(driver, clock)
+
+    # Reels are already still before the first click
+    assert controller.wait_until_stopped()
+    controller.mark_identified()
+    assert controller.summary()["spins"] == 0
+    assert controller.summary()["mean_spin_duration"] is None
+
+    controller.spin(_Button())
+    assert controller.wait_until_stopped()
+    controller.spin(_Button())
+    assert controller.wait_until_stopped()
+    summary = controller.summary()
+    assert summary["spins"] == 2
+    assert summary["mean_spin_duration"] == pytest.approx(0.0)
@@ -0,0 +1,56 @@
+from collections import Counter
+from typing import List
+
+import numpy as np
+import pytest
+
+from frame_processing.symbols_aggregator.symbols_aggregator import SymbolsAggregator
+
+
+def _images() -> List[np.ndarray]:
+    rng = np.random.default_rng(0)
+
+    def noisy(base: np.ndarray) -> np.ndarray:
+        return np.clip(base + rng.normal(0, 10, base.shape), 0, 255).astype(np.uint8)
+
+    images = []
+    # Separate clusters of noisy copies
+    for _ in range(5):
+        base = rng.uniform(0, 255, (20, 24, 3))
+        images += [noisy(base) for _ in range(8)]
+    # Chain of similar neighbours between two unrelated images, connected only
+    # through pairs from different blocks once shuffled
+    start, end = rng.uniform(0, 255, (2, 20, 24, 3))
+    images += [noisy((1 - t) * start + t * end) for t in np.linspace(0, 1, 15)]
+    # Unrelated images
+    images += [noisy(rng.uniform(0, 255, (20, 24, 3))) for _ in range(10)]
+    return [images[index] for index in rng.permutation(len(images))]
+
+
+def _connected_components_symbols(
+    images: List[np.ndarray], correlation_distance_threshold: float = 0.2
+) -> List[np.ndarray]:
+    # Clustering by connected components of the dense correlation graph
+    from scipy.sparse.csgraph import connected_components
+
+    correlation = np.corrcoef(np.stack([image.ravel() for image in images]))
+    _, labels = connected_components(
+        correlation > 1 - correlation_distance_threshold, directed=False
+    )
+    components = [label for label, count in Counter(labels).items() if count > 5]
+    return [images[int(np.argmax(labels == label))] for label in components]
+
+
+@pytest.mark.parametrize("block_size, n_jobs", [(512, 1), (7, 1), (16, 2), (1, 1)])
+def test_blocked_clustering_matches_connected_components(block_size, n_jobs):
+    images = _images()
+    expected = _connected_components_symbols(images)
+
+    symbols = SymbolsAggregator.collect_symbols(
+        images, block_size=block_size, n_jobs=n_jobs
+    )
+
+    # Five clusters and the chain
+    assert len(expected) == 6
+    assert len(symbols) == len(expected)
+    assert all(np.array_equal(a, b) for a, b in zip(symbols, expected))
@@ -0,0 +1,108 @@
+from typing import Dict
+
+import numpy as np
+import pytest
+
+from benchmarks.synthetic import SyntheticRenderer
+from games.slots_fortune.processing.config import SYMBOLS_DIR, GRID, SCREEN_ROI
+from utils.custom_metrics import (
+    CORRELATION_TOLERANCE,
+    center_templates,
+    normalized_correlation_maps,
+    template_interior,
+    threshold_query,
+)
+from utils.io import read_expected_symbols
+
+
+def _cells(roi_image: np.ndarray) -> np.ndarray:
+    return np.stack(
+        [
+            roi_image[
+                cell.roi.y_top : cell.roi.y_bottom,
+                cell.roi.x_left : cell.roi.x_right,
+                0,
+            ]
+            for cell in GRID.cells
+        ]
+    )
+
+
+@pytest.fixture(scope="module")
+def expected_symbols():
+    return read_expected_symbols(SYMBOLS_DIR)
+
+
+@pytest.fixture(scope="module")
+def templates(expected_symbols):
+    return center_templates(
+        np.stack([template_interior(symbol.image) for symbol in expected_symbols])
+    )
+
+
+@pytest.fixture(scope="module")
+def cells(expected_symbols) -> Dict[str, np.ndarray]:
+    def renderer(**kwargs) -> SyntheticRenderer:
+        return SyntheticRenderer(expected_symbols, GRID, SCREEN_ROI, **kwargs)
+
+    noisy = renderer(noise=8.0, seed=0)
+    blurred = renderer(noise=3.0, blur=2, seed=1)
+    transition = renderer(noise=3.0, seed=2)
+    # Cells larger than symbols, with symbols at random offsets
+    rng = np.random.default_rng(3)
+    still_cells = _cells(noisy.render_roi(noisy.random_symbols()))
+    oversized = rng.normal(
+        SyntheticRenderer.BACKGROUND, 8.0, (len(still_cells), 180, 245)
+    )
+    for image, cell in zip(oversized, still_cells):
+        y, x = rng.integers(0, 41), rng.integers(0, 61)
+        image[y : y + cell.shape[0], x : x + cell.shape[1]] = cell
+    return dict(
+        noisy=still_cells,
+        blurred=_cells(blurred.render_roi(blurred.random_symbols())),
+        transition=_cells(transition.render_transition()),
+        oversized=np.clip(oversized, 0, 255).astype(np.uint8),
+    )
+
+
+@pytest.mark.parametrize("threshold", [0.5, 0.7])
+@pytest.mark.parametrize("windows_step", [1, 2, 3, 4, 5])
+@pytest.mark.parametrize("kind", ["noisy", "blurred", "transition", "oversized"])
+def test_threshold_query_matches_exhaustive_search(
+    templates, cells, kind, windows_step, threshold
+):
+    centered, norms = templates
+    images = cells[kind]
+
+    scores = normalized_correlation_maps(images, centered, norms, windows_step).max(
+        axis=(2, 3)
+    )
+    passed = scores > threshold
+    expected = np.where(passed.any(axis=1), passed.argmax(axis=1), -1)
+    found, evaluated = threshold_query(
+        images, centered, norms, threshold, windows_step=windows_step
+    )
+
+    # Scores within the tolerance of the threshold may be decided either way
+    decided = ~(np.abs(scores - threshold) <= CORRELATION_TOLERANCE).any(axis=1)
+    assert decided.sum() >= len(images) - 1
+    assert np.array_equal(found[decided], expected[decided])
+    # Bounds prune most windows
+    windows = (
+        scores.shape[1]
+        * ((images.shape[1] - centered.shape[1]) // windows_step + 1)
+        * ((images.shape[2] - centered.shape[2]) // windows_step + 1)
+    )
+    assert (evaluated < windows).all()
+
+
+def test_still_cells_are_identified(expected_symbols, templates):
+    centered, norms = templates
+    renderer = SyntheticRenderer(expected_symbols, GRID, SCREEN_ROI, noise=8.0)
+    symbol_ids = renderer.random_symbols()
+    images = _cells(renderer.render_roi(symbol_ids))
+
+    found, _ = threshold_query(images, centered, norms, 0.7)
+
+    expected = [symbol_ids[cell.index.y, cell.index.x] for cell in GRID.cells]
+    assert found.tolist() == expected
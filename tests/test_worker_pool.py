@@ -0,0 +1,63 @@
+import pytest
+
+from frame_processing.worker_pool import create_process_pool, submit, worker_state
+from utils import metrics, state
+
+
+@pytest.fixture(autouse=True)
+def enabled_metrics(monkeypatch):
+    monkeypatch.setitem(state.state, "debug", True)
+    monkeypatch.setitem(state.state, "debug_dir", state.get_debug_dir())
+    monkeypatch.setattr(metrics, "_enabled", True)
+    monkeypatch.setattr(metrics, "registry", metrics.MetricsRegistry())
+
+
+def _worker_settings(value: int) -> tuple:
+    metrics.increment("worker.tasks")
+    metrics.observe("worker.task", 0.01 * value)
+    return (
+        worker_state["name"],
+        state.is_debug_mode_activated(),
+        state.get_debug_dir(),
+        value,
+    )
+
+
+def test_workers_get_runtime_settings_and_send_back_metrics(tmp_path):
+    state.set_debug_dir(tmp_path / "debug")
+
+    with create_process_pool(2, name="pool") as executor:
+        futures = [submit(executor, _worker_settings, value) for value in range(5)]
+        results = [future.result() for future in futures]
+
+    assert results == [("pool", True, tmp_path / "debug", value) for value in range(5)]
+    snapshot = metrics.snapshot()
+    assert snapshot["counters"]["worker.tasks"] == 5
+    assert snapshot["histograms"]["worker.task"]["count"] == 5
+    assert snapshot["histograms"]["worker.task"]["sum"] == pytest.approx(0.1)
+
+
+def _fail():
+    raise ValueError("Task failed")
+
+
+def test_task_error_is_raised_from_future():
+    with create_process_pool(1) as executor:
+        future = submit(executor, _fail)
+        with pytest.raises(ValueError, match="Task failed"):
+            future.result()
+
+
+def test_drained_metrics_are_merged():
+    worker = metrics.MetricsRegistry()
+    worker.increment("frames", 2)
+    worker.observe("process_frame", 0.5)
+    metrics.registry.observe("process_frame", 1.5)
+
+    metrics.registry.merge(worker.drain())
+
+    assert worker.snapshot()["counters"] == {}
+    snapshot = metrics.snapshot()
+    assert snapshot["counters"] == {"frames": 2}
+    assert snapshot["histograms"]["process_frame"]["count"] == 2
+    assert snapshot["histograms"]["process_frame"]["max"] == 1.5
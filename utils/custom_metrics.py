@@ -1,32 +1,408 @@
+from typing import Tuple, Optional
+
 import numpy as np
-from skimage.util import view_as_windows
 
+# Scores are computed in float32 with FFT cross-correlation and integral-image
+# window statistics. They agree with per-window np.corrcoef (float64) to within
+# CORRELATION_TOLERANCE. Windows with zero variance score 0 instead of nan.
+CORRELATION_TOLERANCE = 1e-4
 
-def _corr(img1, img2):
-    r = np.corrcoef(img1, img2)
-    return r[0][1]
 
+def template_interior(image: np.ndarray, windows_part: float = 0.1) -> np.ndarray:
+    x_thresh = int(image.shape[1] * windows_part)
+    y_thresh = int(image.shape[0] * windows_part)
+    interior = image[
+        y_thresh : image.shape[0] - y_thresh, x_thresh : image.shape[1] - x_thresh, 0
+    ]
+    return interior.astype(np.float32)
 
-_corr = np.vectorize(_corr, signature="(n), (n) ->()")
 
+def center_templates(templates: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    templates = templates.astype(np.float32)
+    centered = templates - templates.mean(axis=(1, 2), keepdims=True)
+    norms = np.sqrt(np.square(centered, dtype=np.float64).sum(axis=(1, 2)))
+    return centered, norms.astype(np.float32)
 
-def window_correlation(
-    img1: np.ndarray, img2: np.ndarray, windows_part: float = 0.1, windows_step: int = 3
+
+def _spectrum_shape(image_shape: Tuple[int, int]) -> Tuple[int, int]:
+    from scipy import fft
+
+    return tuple(fft.next_fast_len(size, real=True) for size in image_shape)
+
+
+def templates_spectrum(
+    centered_templates: np.ndarray, image_shape: Tuple[int, int]
+) -> np.ndarray:
+    from scipy import fft
+
+    return np.conj(fft.rfft2(centered_templates, s=_spectrum_shape(image_shape)))
+
+
+def _safe_divide(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    # Windows with zero variance score 0
+    return np.divide(
+        numerator,
+        denominator,
+        out=np.zeros_like(numerator),
+        where=denominator > np.finfo(np.float32).eps,
+    )
+
+
+def _window_statistics(
+    images: np.ndarray, window_shape: Tuple[int, int], windows_step: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    import cv2
+
+    h, w = window_shape
+    n = h * w
+    integral = np.empty((images.shape[0], images.shape[1] + 1, images.shape[2] + 1))
+    squares_integral = np.empty_like(integral)
+    for image, image_integral, image_squares_integral in zip(
+        images.astype(np.float32), integral, squares_integral
+    ):
+        # Sums and sums of squares are accumulated in float64
+        image_integral[:], image_squares_integral[:] = cv2.integral2(
+            image, sdepth=cv2.CV_64F, sqdepth=cv2.CV_64F
+        )
+
+    def window_sums(table: np.ndarray) -> np.ndarray:
+        sums = (
+            table[:, h:, w:]
+            - table[:, :-h, w:]
+            - table[:, h:, :-w]
+            + table[:, :-h, :-w]
+        )
+        return sums[:, ::windows_step, ::windows_step]
+
+    sums = window_sums(integral)
+    variances = window_sums(squares_integral) - sums * sums / n
+    return sums, np.sqrt(np.maximum(variances, 0)).astype(np.float32)
+
+
+def _window_norms(
+    images: np.ndarray, window_shape: Tuple[int, int], windows_step: int
+) -> np.ndarray:
+    return _window_statistics(images, window_shape, windows_step)[1]
+
+
+def _cross_correlation(
+    images: np.ndarray,
+    spectrum: np.ndarray,
+    window_shape: Tuple[int, int],
+    windows_step: int,
+) -> np.ndarray:
+    from scipy import fft
+
+    height, width = images.shape[1:]
+    h, w = window_shape
+    shape = _spectrum_shape((height, width))
+
+    images_spectrum = fft.rfft2(images, s=shape)
+    correlation = fft.irfft2(images_spectrum[:, None] * spectrum[None], s=shape)
+    return correlation[
+        ..., : height - h + 1 : windows_step, : width - w + 1 : windows_step
+    ]
+
+
+def normalized_correlation_maps(
+    images: np.ndarray,
+    centered_templates: np.ndarray,
+    templates_norms: np.ndarray,
+    windows_step: int = 3,
+    spectrum: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    window_shape = centered_templates.shape[1:]
+    if images.shape[1] < window_shape[0] or images.shape[2] < window_shape[1]:
+        raise ValueError("Template should not be larger than image")
+    if spectrum is None:
+        spectrum = templates_spectrum(centered_templates, images.shape[1:])
+
+    images = images.astype(np.float32)
+    # Global shift of image intensities does not change the correlation with
+    # a zero-mean template, but keeps float32 FFT accumulation precise
+    images = images - images.mean(axis=(1, 2), keepdims=True)
+
+    numerator = _cross_correlation(images, spectrum, window_shape, windows_step)
+    denominator = (
+        _window_norms(images, window_shape, windows_step)[:, None]
+        * templates_norms[None, :, None, None]
+    )
+    return _safe_divide(numerator, denominator)
+
+
+def downscale(images: np.ndarray, factor: int) -> np.ndarray:
+    # Mean over factor x factor blocks, trailing rows and columns are dropped
+    n, height, width = images.shape
+    height, width = height // factor, width // factor
+    blocks = images[:, : height * factor, : width * factor].reshape(
+        n, height, factor, width, factor
+    )
+    return blocks.mean(axis=(2, 4), dtype=np.float32)
+
+
+def _refined_score(
+    image: np.ndarray,
+    windows_norms: np.ndarray,
+    centered_template: np.ndarray,
+    template_norm: float,
+    y: int,
+    x: int,
+    radius: int,
 ) -> float:
-    x_thresh = int(img2.shape[1] * windows_part)
-    y_thresh = int(img2.shape[0] * windows_part)
+    # Exact stride 1 search over offsets within radius around (y, x)
+    h, w = centered_template.shape
+    y_top, y_bottom = max(y - radius, 0), min(y + radius, image.shape[0] - h)
+    x_left, x_right = max(x - radius, 0), min(x + radius, image.shape[1] - w)
+    windows = np.lib.stride_tricks.sliding_window_view(
+        image[y_top : y_bottom + h, x_left : x_right + w], (h, w)
+    )
+    numerator = np.einsum("yxhw,hw->yx", windows, centered_template)
+    denominator = (
+        windows_norms[y_top : y_bottom + 1, x_left : x_right + 1] * template_norm
+    )
+    scores = _safe_divide(numerator, denominator)
+    return float(scores.max())
+
+
+def pyramid_correlation_scores(
+    images: np.ndarray,
+    centered_templates: np.ndarray,
+    templates_norms: np.ndarray,
+    coarse_templates: np.ndarray,
+    coarse_norms: np.ndarray,
+    factor: int = 2,
+    candidates: int = 3,
+    coarse_spectrum: Optional[np.ndarray] = None,
+    refine_above: Optional[float] = None,
+) -> np.ndarray:
+    # Best offsets are found at 1/factor scale, then the best candidates templates
+    # of every image are refined at full scale around them. Templates with coarse
+    # score below refine_above are not refined. Scores of not refined templates
+    # are 0. Coarse scores are mostly higher than full scale ones, since
+    # downscaling smooths out noise
+    images = images.astype(np.float32)
+    coarse_maps = normalized_correlation_maps(
+        downscale(images, factor),
+        coarse_templates,
+        coarse_norms,
+        windows_step=1,
+        spectrum=coarse_spectrum,
+    )
+    coarse_width = coarse_maps.shape[3]
+    coarse_maps = coarse_maps.reshape(coarse_maps.shape[:2] + (-1,))
+    best_offsets = coarse_maps.argmax(axis=2)
+    coarse_scores = np.take_along_axis(coarse_maps, best_offsets[..., None], 2)[..., 0]
+
+    images = images - images.mean(axis=(1, 2), keepdims=True)
+    windows_norms = _window_norms(images, centered_templates.shape[1:], 1)
+    scores = np.zeros(coarse_scores.shape, np.float32)
+    refined = np.argsort(-coarse_scores, axis=1, kind="stable")[:, :candidates]
+    for image_index, template_indices in enumerate(refined):
+        for template_index in template_indices:
+            if (
+                refine_above is not None
+                and coarse_scores[image_index, template_index] < refine_above
+            ):
+                break
+            y, x = divmod(int(best_offsets[image_index, template_index]), coarse_width)
+            scores[image_index, template_index] = _refined_score(
+                images[image_index],
+                windows_norms[image_index],
+                centered_templates[template_index],
+                templates_norms[template_index],
+                y * factor,
+                x * factor,
+                radius=factor,
+            )
+    return scores
+
+
+def block_templates(
+    centered_templates: np.ndarray, block: int
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # Split of templates into block means and residuals, for correlation bounds.
+    # Returns block means, sums of the block part and norms of the residuals
+    means = downscale(centered_templates, block)
+    height, width = means.shape[1:]
+    blocks = np.zeros_like(centered_templates)
+    blocks[:, : height * block, : width * block] = means.repeat(block, 1).repeat(
+        block, 2
+    )
+    residuals = centered_templates - blocks
+    residual_norms = np.sqrt(np.square(residuals, dtype=np.float64).sum(axis=(1, 2)))
+    return (
+        means,
+        blocks.sum(axis=(1, 2), dtype=np.float64).astype(np.float32),
+        residual_norms.astype(np.float32),
+    )
+
+
+def correlation_upper_bounds(
+    images: np.ndarray,
+    templates_norms: np.ndarray,
+    blocks: Tuple[np.ndarray, np.ndarray, np.ndarray],
+    window_shape: Tuple[int, int],
+    windows_step: int,
+    blocks_spectrum: Optional[np.ndarray] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    # Upper bounds of correlations of zero-mean images with templates for windows
+    # with the step, from the correlation with template block means at 1/step
+    # scale and the Cauchy-Schwarz bound for the residuals:
+    # <x - mean, t> <= <x - mean, t_blocks> + ||x - mean|| * ||t_residual||
+    # Returns bounds of shape (N, T, py, px) and window norms of shape (N, py, px)
+    means, blocks_sums, residual_norms = blocks
+    sums, windows_norms = _window_statistics(images, window_shape, windows_step)
+    coarse = downscale(images, windows_step)
+    if blocks_spectrum is None:
+        blocks_spectrum = templates_spectrum(means, coarse.shape[1:])
+    blocks_correlation = _cross_correlation(
+        coarse, blocks_spectrum, means.shape[1:], 1
+    )[..., : sums.shape[1], : sums.shape[2]]
+
+    windows_means = (sums / (window_shape[0] * window_shape[1])).astype(np.float32)
+    numerator = (
+        blocks_correlation * windows_step**2
+        - windows_means[:, None] * blocks_sums[None, :, None, None]
+        + windows_norms[:, None] * residual_norms[None, :, None, None]
+    )
+    denominator = windows_norms[:, None] * templates_norms[None, :, None, None]
+    bounds = _safe_divide(numerator, denominator)
+    return bounds, windows_norms
 
-    img2 = img2[y_thresh:-y_thresh, x_thresh:-x_thresh, 0]
-    img1 = img1[:, :, 0]
-    windows = view_as_windows(img1, img2.shape, step=windows_step)
 
-    number_of_windows = windows.shape[0] * windows.shape[1]
-    windows = windows.reshape((number_of_windows, -1))
-    img2 = img2.flatten()
+def _windows_scores(
+    image: np.ndarray,
+    windows_norms: np.ndarray,
+    centered_template: np.ndarray,
+    template_norm: float,
+    positions: np.ndarray,
+    windows_step: int,
+) -> np.ndarray:
+    h, w = centered_template.shape
+    rows, columns = np.divmod(positions, windows_norms.shape[1])
+    windows = np.stack(
+        [
+            image[y : y + h, x : x + w]
+            for y, x in zip(rows * windows_step, columns * windows_step)
+        ]
+    )
+    numerator = windows.reshape(len(positions), -1) @ centered_template.ravel()
+    denominator = windows_norms[rows, columns] * template_norm
+    return _safe_divide(numerator, denominator)
 
-    cc = _corr(windows, img2)
-    result = max(cc)
-    return result
+
+def threshold_query(
+    images: np.ndarray,
+    centered_templates: np.ndarray,
+    templates_norms: np.ndarray,
+    threshold: float,
+    windows_step: int = 3,
+    blocks: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]] = None,
+    blocks_spectrum: Optional[np.ndarray] = None,
+    chunk_size: int = 16,
+) -> Tuple[np.ndarray, np.ndarray]:
+    # For every image finds the first template with any window correlation above
+    # the threshold, same as thresholding exhaustive maps. Windows are checked
+    # from the centre, and windows with upper bound below the threshold are
+    # skipped. Returns template indices (-1 if none) and numbers of evaluated
+    # windows
+    window_shape = centered_templates.shape[1:]
+    if images.shape[1] < window_shape[0] or images.shape[2] < window_shape[1]:
+        raise ValueError("Template should not be larger than image")
+    if blocks is None:
+        blocks = block_templates(centered_templates, windows_step)
+
+    images = images.astype(np.float32)
+    images = images - images.mean(axis=(1, 2), keepdims=True)
+    bounds, windows_norms = correlation_upper_bounds(
+        images,
+        templates_norms,
+        blocks,
+        window_shape,
+        windows_step,
+        blocks_spectrum=blocks_spectrum,
+    )
+
+    rows, columns = windows_norms.shape[1:]
+    centre = (
+        (images.shape[1] - window_shape[0]) / 2 / windows_step,
+        (images.shape[2] - window_shape[1]) / 2 / windows_step,
+    )
+    grid_rows, grid_columns = np.divmod(np.arange(rows * columns), columns)
+    order = np.argsort(
+        (grid_rows - centre[0]) ** 2 + (grid_columns - centre[1]) ** 2, kind="stable"
+    )
+    bounds = bounds.reshape(bounds.shape[:2] + (-1,))[:, :, order]
+    # Bounds are computed in float32 too
+    passing_bounds = bounds > threshold - CORRELATION_TOLERANCE
+
+    found = np.full(len(images), -1)
+    evaluated = np.zeros(len(images), int)
+    for image_index in range(len(images)):
+        for template_index in range(len(centered_templates)):
+            positions = order[passing_bounds[image_index, template_index]]
+            if not len(positions):
+                continue
+            # Centre-most window alone, it passes for most aligned symbols
+            starts = [0] + list(range(1, len(positions), chunk_size))
+            for start in starts:
+                chunk = positions[start : start + (chunk_size if start else 1)]
+                evaluated[image_index] += len(chunk)
+                scores = _windows_scores(
+                    images[image_index],
+                    windows_norms[image_index],
+                    centered_templates[template_index],
+                    templates_norms[template_index],
+                    chunk,
+                    windows_step,
+                )
+                if (scores > threshold).any():
+                    found[image_index] = template_index
+                    break
+            if found[image_index] >= 0:
+                break
+    return found, evaluated
+
+
+def window_correlation_maps(
+    images: np.ndarray, templates: np.ndarray, windows_step: int = 3
+) -> np.ndarray:
+    centered, templates_norms = center_templates(templates)
+    return normalized_correlation_maps(images, centered, templates_norms, windows_step)
+
+
+def batch_window_correlation(
+    images: np.ndarray, templates: np.ndarray, windows_step: int = 3
+) -> np.ndarray:
+    maps = window_correlation_maps(images, templates, windows_step)
+    return maps.max(axis=(2, 3))
+
+
+def window_correlation(
+    img1: np.ndarray,
+    img2: np.ndarray,
+    windows_part: float = 0.1,
+    windows_step: int = 3,
+    pyramid_factor: Optional[int] = None,
+) -> float:
+    template = template_interior(img2, windows_part)
+    image = img1[:, :, 0]
+    if pyramid_factor is not None:
+        centered, norms = center_templates(template[None])
+        coarse_centered, coarse_norms = center_templates(
+            downscale(template[None], pyramid_factor)
+        )
+        scores = pyramid_correlation_scores(
+            image[None],
+            centered,
+            norms,
+            coarse_centered,
+            coarse_norms,
+            factor=pyramid_factor,
+        )
+    else:
+        scores = batch_window_correlation(image[None], template[None], windows_step)
+    return float(scores[0, 0])
 
 
 if __name__ == "__main__":
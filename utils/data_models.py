@@ -1,9 +1,12 @@
-from typing import List, Tuple, Dict
+from typing import List, Tuple, Dict, Optional
 
 import numpy as np
+from numpy.lib.stride_tricks import as_strided
 
 
 class ROI:
+    __slots__ = ("x_left", "x_right", "y_top", "y_bottom")
+
     def __init__(self, x_left: int, x_right: int, y_top: int, y_bottom: int):
         self.x_left = x_left
         self.x_right = x_right
@@ -20,6 +23,8 @@ class ROI:
 
 
 class Vector:
+    __slots__ = ("x", "y")
+
     def __init__(self, x: int, y: int):
         self.x = x
         self.y = y
@@ -30,12 +35,16 @@ class Vector:
 
 
 class GridCell:
+    __slots__ = ("index", "roi")
+
     def __init__(self, index: Vector, roi: ROI):
         self.index = index
         self.roi = roi
 
 
 class CroppedSymbol:
+    __slots__ = ("frame", "index", "image")
+
     def __init__(self, frame: str, index: Vector, image: np.ndarray):
         self.frame = frame
         self.index = index
@@ -63,9 +72,74 @@ class SymbolsGrid:
         self.symbol_size = symbol_size
         self.number_of_elements = number_of_elements
         self.offset = offset
+        self._cells: Optional[List[GridCell]] = None
+        self._cells_key: Optional[tuple] = None
+
+    def _key(self) -> tuple:
+        return (
+            self.start_point.coordinate,
+            self.symbol_size.coordinate,
+            self.number_of_elements.coordinate,
+            self.offset.coordinate,
+        )
 
     @property
     def cells(self) -> List[GridCell]:
+        # Built once, rebuilt only if grid parameters were changed
+        key = self._key()
+        if self._cells_key != key:
+            self._cells = self._build_cells()
+            self._cells_key = key
+        return self._cells
+
+    def fits(self, image_shape: Tuple[int, ...]) -> bool:
+        step = Vector(
+            x=self.symbol_size.x + self.offset.x, y=self.symbol_size.y + self.offset.y
+        )
+        bottom = (
+            self.start_point.y
+            + step.y * (self.number_of_elements.y - 1)
+            + self.symbol_size.y
+        )
+        right = (
+            self.start_point.x
+            + step.x * (self.number_of_elements.x - 1)
+            + self.symbol_size.x
+        )
+        return (
+            self.start_point.x >= 0
+            and self.start_point.y >= 0
+            and step.x > 0
+            and step.y > 0
+            and bottom <= image_shape[0]
+            and right <= image_shape[1]
+        )
+
+    def cells_view(self, image: np.ndarray) -> np.ndarray:
+        # Read-only (rows, columns, height, width, ...) view over the image cells
+        if not self.fits(image.shape):
+            raise ValueError(f"Grid does not fit into image of shape {image.shape}")
+        row_stride, column_stride = image.strides[:2]
+        return as_strided(
+            image[self.start_point.y :, self.start_point.x :],
+            shape=(
+                self.number_of_elements.y,
+                self.number_of_elements.x,
+                self.symbol_size.y,
+                self.symbol_size.x,
+            )
+            + image.shape[2:],
+            strides=(
+                (self.symbol_size.y + self.offset.y) * row_stride,
+                (self.symbol_size.x + self.offset.x) * column_stride,
+                row_stride,
+                column_stride,
+            )
+            + image.strides[2:],
+            writeable=False,
+        )
+
+    def _build_cells(self) -> List[GridCell]:
         cells = []
         for row_index in range(self.number_of_elements.y):
             y_top = (
@@ -94,6 +168,8 @@ class SymbolsGrid:
 
 
 class Reel:
+    __slots__ = ("frame", "index", "symbols")
+
     def __init__(self, frame: str, index: int, symbols: Dict[int, ExpectedSymbol]):
         self.frame = frame
         self.index = index
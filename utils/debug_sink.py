@@ -0,0 +1,140 @@
+import os
+import queue
+import threading
+from multiprocessing.util import Finalize
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from utils import metrics
+from utils.data_models import CroppedSymbol
+from utils.logger import logger
+from utils.state import get_debug_dir, is_debug_mode_activated, strtobool
+
+
+class DebugSink:
+    IMAGE_FORMATS = ("png", "fast_png", "npy")
+
+    def __init__(
+        self,
+        queue_size: int = 256,
+        block: bool = False,
+        every_nth_frame: int = 1,
+        only_unidentified: bool = False,
+        image_format: str = "png",
+    ):
+        if image_format not in self.IMAGE_FORMATS:
+            raise ValueError(
+                f"Unknown image format {image_format}, "
+                f"expected one of {self.IMAGE_FORMATS}"
+            )
+        self._block = block
+        self._every_nth_frame = every_nth_frame
+        self._only_unidentified = only_unidentified
+        self._image_format = image_format
+
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._frames = 0
+        self.written = 0
+        self.dropped = 0
+        self._thread = threading.Thread(target=self._write_loop, daemon=True)
+        self._thread.start()
+
+    def _is_sampled(self, identified: bool) -> bool:
+        sampled = self._frames % self._every_nth_frame == 0
+        self._frames += 1
+        return sampled and not (self._only_unidentified and identified)
+
+    def save_frame(
+        self,
+        frame: str,
+        symbols: List[CroppedSymbol],
+        identified: bool,
+        frame_image: Optional[np.ndarray] = None,
+    ):
+        if not self._is_sampled(identified):
+            return
+        debug_dir = get_debug_dir()
+        images = [
+            (debug_dir / frame / f"image_{index}", symbol.image)
+            for index, symbol in enumerate(symbols)
+        ]
+        if frame_image is not None:
+            images.append((debug_dir / frame, frame_image))
+
+        try:
+            self._queue.put(images, block=self._block)
+        except queue.Full:
+            self.dropped += 1
+            metrics.increment("debug_sink.dropped_frames")
+
+    def _write_image(self, path: Path, image: np.ndarray):
+        import cv2
+        from skimage.io import imsave
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if self._image_format == "npy":
+            np.save(path.with_suffix(".npy"), image)
+        elif self._image_format == "fast_png":
+            if image.ndim == 3 and image.shape[2] >= 3:
+                image = cv2.cvtColor(
+                    image,
+                    cv2.COLOR_RGBA2BGRA if image.shape[2] == 4 else cv2.COLOR_RGB2BGR,
+                )
+            cv2.imwrite(
+                str(path.with_suffix(".png")), image, [cv2.IMWRITE_PNG_COMPRESSION, 1]
+            )
+        else:
+            imsave(path.with_suffix(".png"), image, check_contrast=False)
+
+    def _write_loop(self):
+        while True:
+            images: Optional[List[Tuple[Path, np.ndarray]]] = self._queue.get()
+            try:
+                if images is None:
+                    return
+                with metrics.timer("debug_sink.write"):
+                    for path, image in images:
+                        self._write_image(path, image)
+                self.written += 1
+            except Exception:
+                logger.exception("Failed to write debug images")
+            finally:
+                self._queue.task_done()
+
+    def flush(self):
+        self._queue.join()
+
+    def close(self):
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+
+
+_debug_sink: Optional[DebugSink] = None
+
+
+def set_debug_sink(sink: Optional[DebugSink]):
+    global _debug_sink
+    if _debug_sink is not None:
+        _debug_sink.close()
+    _debug_sink = sink
+    if sink is not None:
+        # Finalize runs at exit of main and of multiprocessing worker processes
+        Finalize(None, sink.close, exitpriority=0)
+
+
+def get_debug_sink() -> Optional[DebugSink]:
+    if _debug_sink is None and is_debug_mode_activated():
+        # Configured from environment, so that worker processes get the same sink
+        set_debug_sink(
+            DebugSink(
+                every_nth_frame=int(os.environ.get("DEBUG_EVERY_NTH_FRAME", "1")),
+                only_unidentified=bool(
+                    strtobool(os.environ.get("DEBUG_ONLY_UNIDENTIFIED", "False"))
+                ),
+                image_format=os.environ.get("DEBUG_IMAGE_FORMAT", "png"),
+            )
+        )
+    return _debug_sink
@@ -1,11 +1,26 @@
+import json
 from pathlib import Path
-from typing import List
+from typing import List, Optional, Sequence, Tuple
 
 import numpy as np
-from skimage.io import imsave, imread
 
 from utils.data_models import ExpectedSymbol, CroppedSymbol, Vector
 
+DATASET_IMAGES_FILENAME = "images.npy"
+DATASET_INDEX_FILENAME = "index.json"
+
+
+def imread(path: Path) -> np.ndarray:
+    from skimage.io import imread as _imread
+
+    return _imread(path)
+
+
+def imsave(path: Path, image: np.ndarray):
+    from skimage.io import imsave as _imsave
+
+    _imsave(path, image)
+
 
 def save_symbols(output_folder: Path, symbols: List[CroppedSymbol]):
     for symbol in symbols:
@@ -16,6 +31,8 @@ def save_symbols(output_folder: Path, symbols: List[CroppedSymbol]):
 
 
 def read_all_symbols(symbols_folder: Path) -> List[np.ndarray]:
+    if is_symbols_dataset(symbols_folder):
+        return list(read_symbols_dataset_images(symbols_folder))
     symbols = []
     for frame_folder in symbols_folder.iterdir():
         for symbol_path in frame_folder.iterdir():
@@ -31,6 +48,8 @@ def save_images_set(output_folder: Path, images: List[np.ndarray]):
 
 
 def read_expected_symbols(symbols_folder: Path) -> List[ExpectedSymbol]:
+    if is_symbols_dataset(symbols_folder):
+        return read_symbols_dataset(symbols_folder).expected_symbols()
     symbols = []
     for symbol_path in symbols_folder.iterdir():
         symbols.append(
@@ -47,15 +66,178 @@ def read_cropped_symbols(frame_symbols_folder: Path) -> List[CroppedSymbol]:
         symbols.append(
             CroppedSymbol(
                 frame=frame_symbols_folder.name,
-                index=Vector(
-                    *[
-                        int(x)
-                        for x in symbol_path.name.replace("symbol_", "")
-                        .replace(".png", "")
-                        .split("_")
-                    ]
-                ),
+                index=Vector(*_parse_symbol_index(symbol_path)),
                 image=imread(symbol_path),
             )
         )
     return symbols
+
+
+class SymbolsDataset:
+    def __init__(
+        self,
+        images: np.ndarray,
+        frames: List[Optional[str]],
+        indices: List[Optional[Tuple[int, int]]],
+        labels: List[Optional[str]],
+    ):
+        self.images = images
+        self.frames = frames
+        self.indices = indices
+        self.labels = labels
+
+    def __len__(self) -> int:
+        return len(self.images)
+
+    def cropped_symbols(self, frame: Optional[str] = None) -> List[CroppedSymbol]:
+        return [
+            CroppedSymbol(
+                frame=self.frames[i], index=Vector(*self.indices[i]), image=image
+            )
+            for i, image in enumerate(self.images)
+            if frame is None or self.frames[i] == frame
+        ]
+
+    def expected_symbols(self) -> List[ExpectedSymbol]:
+        return [
+            ExpectedSymbol(name=label, image=image)
+            for label, image in zip(self.labels, self.images)
+        ]
+
+
+def is_symbols_dataset(folder: Path) -> bool:
+    return (folder / DATASET_IMAGES_FILENAME).exists() and (
+        folder / DATASET_INDEX_FILENAME
+    ).exists()
+
+
+def _parse_symbol_index(symbol_path: Path) -> Tuple[int, int]:
+    x, y = (
+        int(x)
+        for x in symbol_path.name.replace("symbol_", "").replace(".png", "").split("_")
+    )
+    return x, y
+
+
+def _write_symbols_dataset(
+    output_folder: Path,
+    number_of_images: int,
+    images,
+    frames: Sequence[Optional[str]],
+    indices: Sequence[Optional[Tuple[int, int]]],
+    labels: Sequence[Optional[str]],
+):
+    output_folder.mkdir(parents=True, exist_ok=True)
+    array = None
+    for position, image in enumerate(images):
+        if array is None:
+            array = np.lib.format.open_memmap(
+                output_folder / DATASET_IMAGES_FILENAME,
+                mode="w+",
+                dtype=np.uint8,
+                shape=(number_of_images, *image.shape),
+            )
+        if image.shape != array.shape[1:]:
+            raise ValueError(
+                f"All images in dataset should have shape {array.shape[1:]}, "
+                f"got {image.shape}"
+            )
+        array[position] = image
+    if array is None:
+        raise ValueError("Dataset should contain at least one image")
+    array.flush()
+    del array
+
+    with open(output_folder / DATASET_INDEX_FILENAME, "w") as f:
+        json.dump(
+            dict(
+                frames=list(frames),
+                indices=[None if i is None else list(i) for i in indices],
+                labels=list(labels),
+            ),
+            f,
+        )
+
+
+def save_symbols_dataset(
+    output_folder: Path,
+    images: Sequence[np.ndarray],
+    frames: Optional[Sequence[Optional[str]]] = None,
+    indices: Optional[Sequence[Optional[Tuple[int, int]]]] = None,
+    labels: Optional[Sequence[Optional[str]]] = None,
+):
+    _write_symbols_dataset(
+        output_folder,
+        len(images),
+        images,
+        frames=frames or [None] * len(images),
+        indices=indices or [None] * len(images),
+        labels=labels or [None] * len(images),
+    )
+
+
+def read_symbols_dataset_images(folder: Path, mmap: bool = True) -> np.ndarray:
+    images = np.load(folder / DATASET_IMAGES_FILENAME, mmap_mode="r" if mmap else None)
+    # Plain ndarray view over the mapping is much cheaper to slice than np.memmap
+    return images.view(np.ndarray)
+
+
+def read_symbols_dataset(folder: Path, mmap: bool = True) -> SymbolsDataset:
+    images = read_symbols_dataset_images(folder, mmap)
+    with open(folder / DATASET_INDEX_FILENAME) as f:
+        index = json.load(f)
+    return SymbolsDataset(
+        images=images,
+        frames=index["frames"],
+        indices=[None if i is None else tuple(i) for i in index["indices"]],
+        labels=index["labels"],
+    )
+
+
+def convert_symbols_folder(symbols_folder: Path, output_folder: Path):
+    paths = [
+        symbol_path
+        for frame_folder in sorted(symbols_folder.iterdir())
+        if frame_folder.is_dir()
+        for symbol_path in sorted(frame_folder.iterdir())
+    ]
+    _write_symbols_dataset(
+        output_folder,
+        len(paths),
+        (imread(path) for path in paths),
+        frames=[path.parent.name for path in paths],
+        indices=[_parse_symbol_index(path) for path in paths],
+        labels=[None] * len(paths),
+    )
+
+
+def convert_expected_symbols_folder(symbols_folder: Path, output_folder: Path):
+    paths = sorted(symbols_folder.glob("*.png"))
+    _write_symbols_dataset(
+        output_folder,
+        len(paths),
+        (imread(path) for path in paths),
+        frames=[None] * len(paths),
+        indices=[None] * len(paths),
+        labels=[path.name.replace(".png", "") for path in paths],
+    )
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Convert folder of symbol PNGs into packed dataset"
+    )
+    parser.add_argument("source", type=Path)
+    parser.add_argument("output", type=Path)
+    parser.add_argument(
+        "--expected",
+        action="store_true",
+        help="Source is a folder of expected symbols instead of frame folders",
+    )
+    arguments = parser.parse_args()
+    if arguments.expected:
+        convert_expected_symbols_folder(arguments.source, arguments.output)
+    else:
+        convert_symbols_folder(arguments.source, arguments.output)
@@ -0,0 +1,234 @@
+import bisect
+import contextlib
+import cProfile
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, Optional
+
+from utils.state import strtobool
+
+
+class Histogram:
+    # Upper bounds from 10 us to ~84 s, doubling
+    BUCKETS = tuple(1e-5 * 2**i for i in range(24))
+
+    def __init__(self):
+        self.bucket_counts = [0] * (len(self.BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.bucket_counts[bisect.bisect_left(self.BUCKETS, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def merge(self, other: "Histogram"):
+        for index, bucket_count in enumerate(other.bucket_counts):
+            self.bucket_counts[index] += bucket_count
+        self.count += other.count
+        self.sum += other.sum
+        self.max = max(self.max, other.max)
+
+    def quantile(self, q: float) -> float:
+        rank = q * self.count
+        cumulative = 0
+        for bound, bucket_count in zip(self.BUCKETS, self.bucket_counts):
+            cumulative += bucket_count
+            if cumulative >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self) -> dict:
+        return dict(
+            count=self.count,
+            sum=self.sum,
+            mean=self.sum / self.count if self.count else 0.0,
+            p50=self.quantile(0.5),
+            p99=self.quantile(0.99),
+            max=self.max,
+        )
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, float] = defaultdict(int)
+        self._histograms: Dict[str, Histogram] = defaultdict(Histogram)
+
+    def increment(self, name: str, value: float = 1):
+        with self._lock:
+            self._counters[name] += value
+
+    def observe(self, name: str, value: float):
+        with self._lock:
+            self._histograms[name].observe(value)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def drain(self) -> dict:
+        # Raw values are taken out, so that they can be merged into another
+        # registry, e.g. of the parent of a worker process
+        with self._lock:
+            drained = dict(counters=self._counters, histograms=self._histograms)
+            self._counters = defaultdict(int)
+            self._histograms = defaultdict(Histogram)
+        return drained
+
+    def merge(self, drained: dict):
+        with self._lock:
+            for name, value in drained["counters"].items():
+                self._counters[name] += value
+            for name, histogram in drained["histograms"].items():
+                self._histograms[name].merge(histogram)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return dict(
+                timestamp=time.time(),
+                counters=dict(self._counters),
+                histograms={
+                    name: histogram.to_dict()
+                    for name, histogram in self._histograms.items()
+                },
+            )
+
+    def to_prometheus(self) -> str:
+        lines = []
+        with self._lock:
+            for name, value in sorted(self._counters.items()):
+                metric = _prometheus_name(name) + "_total"
+                lines += [f"# TYPE {metric} counter", f"{metric} {value}"]
+            for name, histogram in sorted(self._histograms.items()):
+                metric = _prometheus_name(name) + "_seconds"
+                lines.append(f"# TYPE {metric} histogram")
+                cumulative = 0
+                for bound, bucket_count in zip(
+                    histogram.BUCKETS, histogram.bucket_counts
+                ):
+                    cumulative += bucket_count
+                    lines.append(f'{metric}_bucket{{le="{bound:g}"}} {cumulative}')
+                lines += [
+                    f'{metric}_bucket{{le="+Inf"}} {histogram.count}',
+                    f"{metric}_sum {histogram.sum}",
+                    f"{metric}_count {histogram.count}",
+                ]
+        return "\n".join(lines) + "\n"
+
+
+def _prometheus_name(name: str) -> str:
+    return "slots_" + "".join(c if c.isalnum() else "_" for c in name)
+
+
+registry = MetricsRegistry()
+_enabled = bool(strtobool(os.environ.get("METRICS", "False")))
+_profiled_stage: Optional[str] = None
+_profiler: Optional[cProfile.Profile] = None
+
+
+def set_metrics_enabled(enabled: bool):
+    global _enabled
+    _enabled = enabled
+
+
+def is_metrics_enabled() -> bool:
+    return _enabled
+
+
+def increment(name: str, value: float = 1):
+    if _enabled:
+        registry.increment(name, value)
+
+
+def observe(name: str, value: float):
+    if _enabled:
+        registry.observe(name, value)
+
+
+class _Timer:
+    __slots__ = ("_name", "_start")
+
+    def __init__(self, name: str):
+        self._name = name
+
+    def __enter__(self):
+        if self._name == _profiled_stage and _profiler is not None:
+            _profiler.enable()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed = time.perf_counter() - self._start
+        if self._name == _profiled_stage and _profiler is not None:
+            _profiler.disable()
+        if _enabled:
+            registry.observe(self._name, elapsed)
+
+
+_NULL_TIMER = contextlib.nullcontext()
+
+
+def timer(name: str):
+    if not _enabled and name != _profiled_stage:
+        return _NULL_TIMER
+    return _Timer(name)
+
+
+def profile_stage(name: Optional[str]):
+    global _profiled_stage, _profiler
+    _profiled_stage = name
+    _profiler = cProfile.Profile() if name is not None else None
+
+
+def dump_profile(output_path: Path):
+    if _profiler is None:
+        raise ValueError("No stage is profiled")
+    _profiler.dump_stats(str(output_path))
+
+
+def snapshot() -> dict:
+    return registry.snapshot()
+
+
+def export(output_path: Path, metrics_format: str = "json"):
+    if metrics_format == "prometheus":
+        content = registry.to_prometheus()
+    elif metrics_format == "json":
+        content = json.dumps(registry.snapshot())
+    else:
+        raise ValueError(f"Unknown metrics format {metrics_format}")
+    tmp_path = output_path.with_suffix(output_path.suffix + ".tmp")
+    tmp_path.write_text(content)
+    tmp_path.replace(output_path)
+
+
+class PeriodicExporter:
+    def __init__(
+        self, output_path: Path, interval: float = 10.0, metrics_format: str = "json"
+    ):
+        self._output_path = output_path
+        self._interval = interval
+        self._metrics_format = metrics_format
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self._interval):
+            export(self._output_path, self._metrics_format)
+
+    def start(self) -> "PeriodicExporter":
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        export(self._output_path, self._metrics_format)
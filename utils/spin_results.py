@@ -0,0 +1,129 @@
+from pathlib import Path
+from typing import List, Dict, Optional, Union, BinaryIO
+
+import numpy as np
+
+FrameResult = Optional[List[Dict[int, str]]]
+
+# Cells of a reel without a symbol, symbol ids are indices in the names table
+MISSING_SYMBOL = 255
+
+
+class SpinResults:
+    INITIAL_CAPACITY = 64
+
+    def __init__(self, reels: int, rows: int, names: Optional[List[str]] = None):
+        self.reels = reels
+        self.rows = rows
+        self.names: List[str] = list(names or [])
+        self._name_ids: Dict[str, int] = {name: i for i, name in enumerate(self.names)}
+        self.frames: List[str] = []
+        self._symbols = np.full(
+            (self.INITIAL_CAPACITY, reels, rows), MISSING_SYMBOL, np.uint8
+        )
+        self._valid = np.zeros(self.INITIAL_CAPACITY, bool)
+
+    def __len__(self) -> int:
+        return len(self.frames)
+
+    @property
+    def symbols(self) -> np.ndarray:
+        return self._symbols[: len(self)]
+
+    @property
+    def valid(self) -> np.ndarray:
+        return self._valid[: len(self)]
+
+    def _name_id(self, name: str) -> int:
+        if name not in self._name_ids:
+            if len(self.names) >= MISSING_SYMBOL:
+                raise ValueError(f"At most {MISSING_SYMBOL} symbol names are supported")
+            self._name_ids[name] = len(self.names)
+            self.names.append(name)
+        return self._name_ids[name]
+
+    def _reserve(self, size: int):
+        capacity = len(self._valid)
+        if size <= capacity:
+            return
+        capacity = max(size, 2 * capacity)
+        symbols = np.full((capacity, self.reels, self.rows), MISSING_SYMBOL, np.uint8)
+        symbols[: len(self)] = self.symbols
+        valid = np.zeros(capacity, bool)
+        valid[: len(self)] = self.valid
+        self._symbols, self._valid = symbols, valid
+
+    def append(self, frame: str, reels: FrameResult):
+        self._reserve(len(self) + 1)
+        position = len(self)
+        if reels is not None:
+            if len(reels) > self.reels:
+                raise ValueError(
+                    f"Expected at most {self.reels} reels, got {len(reels)}"
+                )
+            for reel_index, reel in enumerate(reels):
+                for row, name in reel.items():
+                    self._symbols[position, reel_index, int(row)] = self._name_id(name)
+            self._valid[position] = True
+        self.frames.append(frame)
+
+    def frame_result(self, position: int) -> FrameResult:
+        if not self._valid[position]:
+            return None
+        return [
+            {
+                row: self.names[symbol_id]
+                for row, symbol_id in enumerate(reel)
+                if symbol_id != MISSING_SYMBOL
+            }
+            for reel in self._symbols[position].tolist()
+        ]
+
+    @classmethod
+    def from_dict(cls, results: Dict[str, FrameResult]) -> "SpinResults":
+        frames_reels = [reels for reels in results.values() if reels is not None]
+        spin_results = cls(
+            reels=max((len(reels) for reels in frames_reels), default=0),
+            rows=max(
+                (
+                    int(row) + 1
+                    for reels in frames_reels
+                    for reel in reels
+                    for row in reel
+                ),
+                default=0,
+            ),
+        )
+        spin_results._reserve(len(results))
+        for frame, reels in results.items():
+            spin_results.append(frame, reels)
+        return spin_results
+
+    def to_dict(self) -> Dict[str, FrameResult]:
+        return {
+            frame: self.frame_result(position)
+            for position, frame in enumerate(self.frames)
+        }
+
+    def save(self, file: Union[Path, BinaryIO]):
+        np.savez_compressed(
+            file,
+            symbols=self.symbols,
+            valid=self.valid,
+            names=np.array(self.names, dtype=str),
+            frames=np.array(self.frames, dtype=str),
+        )
+
+    @classmethod
+    def load(cls, file: Union[Path, BinaryIO]) -> "SpinResults":
+        with np.load(file) as data:
+            symbols = data["symbols"]
+            spin_results = cls(
+                reels=symbols.shape[1],
+                rows=symbols.shape[2],
+                names=data["names"].tolist(),
+            )
+            spin_results._symbols = symbols
+            spin_results._valid = data["valid"]
+            spin_results.frames = data["frames"].tolist()
+        return spin_results
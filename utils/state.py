@@ -1,6 +1,15 @@
 import os
 from pathlib import Path
-from distutils.util import strtobool
+
+
+def strtobool(value: str) -> bool:
+    value = value.lower()
+    if value in ("y", "yes", "t", "true", "on", "1"):
+        return True
+    if value in ("n", "no", "f", "false", "off", "0"):
+        return False
+    raise ValueError(f"Invalid truth value {value}")
+
 
 state = {
     "debug": bool(strtobool(os.environ.get("DEBUG", "True"))),
@@ -17,5 +26,9 @@ def get_debug_dir() -> Path:
     return state["debug_dir"]
 
 
+def set_debug_mode(activated: bool):
+    state["debug"] = activated
+
+
 def is_debug_mode_activated() -> bool:
     return state["debug"]